@@ -1,22 +1,31 @@
-import time
-import requests
-import base64
 import datetime
-import csv
-from dateutil import parser
 import pytz
 import logging
 import os
+import sys
 from concurrent.futures import ThreadPoolExecutor
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cin7.client import get_client, close_clients, configure, date_where
+from cin7.dates import parse_date, format_date
+from cin7.store import open_store
+from cin7.cli import build_parser
+from cin7.pipeline import open_sink, intern_value
+from cin7.metrics import write_metrics
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Configuration
-BASE_URL = 'https://api.cin7.com/api/v1/CreditNotes'
+ENDPOINT = 'CreditNotes'
+DATE_FIELD = 'completedDate'  # Filtered server-side so only the requested window is paged
 FIELDS = 'id,reference,company,firstName,lastName,projectName,source,currencyCode,currencyRate,lineItems,completedDate,invoiceNumber'
 ROWS_PER_PAGE = 250
 
+# Output columns, in the order process_credit_note builds each row tuple
+COLUMNS = ['sourceUser','reference','creditNoteNumber','salesReference','createdDate', 'company', 'firstName', 'lastName', 'projectName',
+           'channel', 'currencyCode', 'lineItemcode', 'lineItemName','lineItemQty','lineItemoption3', 'lineItemUnitPrice', 'lineItemDiscount', 'discountTotal','completedDate']
+
 ARL_KEY = os.environ["ARL_KEY"]
 ARIB_KEY = os.environ["ARIB_KEY"]
 ARNL_KEY = os.environ["ARNL_KEY"]
@@ -30,39 +39,6 @@ USERS = [
     {"username": "AlbertRogerNetheEU", "key": ARNL_KEY}
 ]
 
-def get_auth_header(username, key):
-    credentials = f"{username}:{key}"
-    encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-    return {'Authorization': f'Basic {encoded_credentials}', 'Content-Type': 'application/json'}
-
-def call_api(url, headers):
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json(), None
-    except requests.RequestException as e:
-        return None, str(e)
-
-def parse_date(date_string):
-    if not date_string:
-        return None
-
-    try:
-        parsed_date = parser.parse(date_string)
-        if parsed_date.tzinfo is None or parsed_date.tzinfo.utcoffset(parsed_date) is None:
-            parsed_date = pytz.utc.localize(parsed_date)
-        else:
-            parsed_date = parsed_date.astimezone(pytz.utc)
-        return parsed_date
-    except ValueError as e:
-        # Handle specific parsing errors
-        logging.warning(f"Failed to parse date: {date_string}. Error: {e}")
-        return None
-    except Exception as e:
-        # Catch any unexpected exceptions and log them
-        logging.error(f"Unexpected error parsing date: {date_string}. Error: {e}")
-        return None
-
 def calculate_date_range():
     # Set the start and end dates for the year 2024
     start_date = datetime.datetime(2025, 8, 1, tzinfo=pytz.utc)  # (Year, Month, Day, Hour, Minute, Second, ...,)
@@ -70,6 +46,7 @@ def calculate_date_range():
 
     return start_date, end_date
 
+# Safety net only: the API already applies the DATE_FIELD window
 def is_valid_credit_note(credit_note, start_date, end_date):
     if 'completedDate' not in credit_note:
         logging.warning("Sales order missing 'completedDate'.")
@@ -85,9 +62,20 @@ def is_valid_credit_note(credit_note, start_date, end_date):
 def process_credit_note(credit_note, user_name):
     line_items = credit_note.get('lineItems', [])
     currency_rate = float(credit_note.get('currencyRate', 1))
-    created_date = parse_date(credit_note.get('completedDate'))
+    created_date = format_date(credit_note.get('completedDate'))  # Once per credit note, not per line item
     discount_total = credit_note.get('discountTotal', 0)
 
+    # Order-level values shared by every line item row; low-cardinality strings are interned
+    reference = credit_note.get('reference')
+    credit_note_number = credit_note.get('creditNoteNumber')
+    sales_reference = credit_note.get('salesReference')
+    company = intern_value(credit_note.get('company'))
+    first_name = credit_note.get('firstName')
+    last_name = credit_note.get('lastName')
+    project_name = credit_note.get('projectName')
+    channel = intern_value(credit_note.get('source'))
+    currency_code = intern_value(credit_note.get('currencyCode'))
+
      # Create a dictionary to map full names to abbreviations
     user_abbreviations = {
         "AlbertRogerUK": "ARL",
@@ -114,86 +102,80 @@ def process_credit_note(credit_note, user_name):
 
 
 
-        results.append({
-            'sourceUser': abbreviated_user_name,
-            'reference': credit_note.get('reference'),
-            'creditNoteNumber':credit_note.get('creditNoteNumber'),
-            'salesReference': credit_note.get('salesReference'),
-            'createdDate': item.get('createdDate',''),
-            'company': credit_note.get('company'),
-            'firstName': credit_note.get('firstName'),
-            'lastName': credit_note.get('lastName'),
-            'projectName': credit_note.get('projectName'),
-            'channel': credit_note.get('source'),
-            'currencyCode': credit_note.get('currencyCode'),
-            'lineItemcode': item.get('code', ''),
-            'lineItemName': item.get('name', ''),
-            'lineItemQty': item.get('qty', ''),
-            'lineItemoption3': item.get('option3',''),
-            'lineItemUnitPrice': adjusted_unit_price,
-            'lineItemDiscount': -adjusted_discount,
-            'discountTotal': adjusted_discount_total,
-            'completedDate': created_date.strftime('%d/%m/%Y') if created_date else ''
-
-        })
+        results.append((
+            abbreviated_user_name,
+            reference,
+            credit_note_number,
+            sales_reference,
+            item.get('createdDate',''),
+            company,
+            first_name,
+            last_name,
+            project_name,
+            channel,
+            currency_code,
+            item.get('code', ''),
+            item.get('name', ''),
+            item.get('qty', ''),
+            item.get('option3',''),
+            adjusted_unit_price,
+            -adjusted_discount,
+            adjusted_discount_total,
+            created_date,
+        ))
     
     return results
 
-def process_user(user):
-    headers = get_auth_header(user['username'], user['key'])
+def process_page(data, user_name, start_date, end_date):
+    page_credit_notes = []
+    for credit_note in data:
+        try:
+            if is_valid_credit_note(credit_note, start_date, end_date):
+                page_credit_notes.extend(process_credit_note(credit_note, user_name))
+        except Exception as e:
+            logging.error(f"Error processing sales order: {credit_note}. Error: {e}")
+    return page_credit_notes
+
+def process_user(user, store=None, sink=None):
+    client = get_client(user['username'], user['key'])
     start_date, end_date = calculate_date_range()
-    all_credit_notes = []
-    page = 1
-
-    while True:
-        url = f'{BASE_URL}?fields={FIELDS}&page={page}&rows={ROWS_PER_PAGE}'
-        logging.info(f"Fetching page {page} for user {user['username']}...")
-
-        data, error = call_api(url, headers)
-        if error:
-            logging.error(f"API call failed for user {user['username']}: {error}")
-            break
-
-        if not data:
-            logging.info(f"No more data to fetch for user {user['username']}.")
-            break
-
-        for credit_note in data:
-            try:
-                if is_valid_credit_note(credit_note, start_date, end_date):
-                    all_credit_notes.extend(process_credit_note(credit_note, user['username']))
-            except Exception as e:
-                logging.error(f"Error processing sales order: {credit_note}. Error: {e}")
-        logging.info(f"Page {page} processed for user {user['username']}.")
-        page += 1
-        time.sleep(0.5)  # Rate limiting
-
-    return all_credit_notes
+    where = date_where(DATE_FIELD, start_date, end_date)
+
+    if store:
+        # Rebuild from the local order store instead of paging the API
+        for data in store.iter_pages(ENDPOINT, user['username'], DATE_FIELD, start_date, end_date):
+            sink.write(process_page(data, user['username'], start_date, end_date))
+        return
+
+    pages = client.iter_pages(ENDPOINT, {'fields': FIELDS, 'where': where, 'rows': ROWS_PER_PAGE})
+    for page, data in pages:
+        sink.write(process_page(data, user['username'], start_date, end_date))
+
+def parse_args():
+    return build_parser("Download Cin7 credit notes for a fixed date range to CSV.", store_mode='read').parse_args()
 
 def main():
+    args = parse_args()
+    configure(prefetch=args.prefetch, decoder=args.decoder, cache=args.cache, replay=args.replay,
+              retention=args.cache_retention, checkpoint=args.checkpoint, resume=args.resume,
+              checkpoint_dropbox=args.checkpoint_dropbox, fanout=args.fanout, keyset=args.keyset)
+    store = open_store(args.from_store, args.store_dropbox) if args.from_store else None
     start_date, end_date = calculate_date_range()
     
-    fieldnames = ['sourceUser','reference','creditNoteNumber','salesReference','createdDate', 'company', 'firstName', 'lastName', 'projectName', 
-                  'channel', 'currencyCode', 'lineItemcode', 'lineItemName','lineItemQty','lineItemoption3', 'lineItemUnitPrice', 'lineItemDiscount', 'discountTotal','completedDate']
-    
     file_name = f"Credit_Notes_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.csv"
     output_filename = os.path.join("tmp_files", file_name)
     os.makedirs("tmp_files", exist_ok=True)
 
-    all_credit_notes = []
-
-    # Process users in parallel
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        results = executor.map(process_user, USERS)
-        for user_credit_notes in results:
-            all_credit_notes.extend(user_credit_notes)
-
-    # Write all credit notes to a single CSV file
-    with open(output_filename, mode='w', newline='', encoding='utf-8') as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        writer.writeheader()
-        for credit_note in all_credit_notes:
-            writer.writerow(credit_note)
+    # Process users in parallel, streaming each page to the CSV file as it is transformed
+    sink = open_sink(output_filename, COLUMNS, args.output_format, DATE_FIELD)
+    output_filename = sink.path
+    with sink:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda user: process_user(user, store, sink), USERS))
+    close_clients()
+    write_metrics(output_filename)
+    if store:
+        store.close()
 
     logging.info(f"Data successfully written locally at {output_filename}")
 
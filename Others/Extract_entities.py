@@ -0,0 +1,96 @@
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cin7.client import close_clients, configure
+from cin7.store import open_store, save_store
+from cin7.cli import build_parser
+from cin7.engine import EntitySpec, run_entities, OUTPUT_DIR
+from cin7.metrics import write_metrics
+from cin7.scheduler import LANES
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Configuration
+# Entity name -> (extractor script whose configuration and row mapper are used, output file name template, lane)
+ENTITIES = {
+    'SO': ('Sales_Orders.Daily_SO', "Sales_Orders_{start:%Y%m%d}_{end:%Y%m%d}.csv", 'daily'),
+    'Weekly_SO': ('Sales_Orders.WeeklySO', "Sales_Orders_{start:%Y%m%d}_{end:%Y%m%d}.csv", 'daily'),
+    'Select_date_SO': ('Sales_Orders.Select_date_SO', "Sales_Orders_{start:%Y%m%d}_{end:%Y%m%d}.csv", 'backfill'),
+    'CRN': ('Credit_Notes.Daily_CRN', "Credit_Notes_{start:%Y%m%d}_{end:%Y%m%d}.csv", 'daily'),
+    'Weekly_CRN': ('Credit_Notes.Weekly_CRN', "Credit_Notes_{start:%Y%m%d}_{end:%Y%m%d}.csv", 'daily'),
+    'Select_Date_CRN': ('Credit_Notes.Select_Date_CRN', "Credit_Notes_{start:%Y%m%d}_{end:%Y%m%d}.csv", 'backfill'),
+    'PO': ('Purchases.Daily_Purchases', "purchase_orders_Daily.csv", 'daily'),
+    'Monthly_PO': ('Purchases.Monthly_Purchases', "Purchase_Orders_{start:%Y%m%d}_{end:%Y%m%d}.csv", 'backfill'),
+    'Josep_PO': ('Purchases.Josep_purchases', "purchase_orders_LY.csv", 'backfill'),
+}
+DEFAULT_ENTITIES = ['SO', 'CRN', 'PO']
+
+ARL_KEY = os.environ["ARL_KEY"]
+ARIB_KEY = os.environ["ARIB_KEY"]
+ARNL_KEY = os.environ["ARNL_KEY"]
+ARF_KEY = os.environ["ARF_KEY"]
+
+# List of user credentials
+USERS = [
+    {"username": "AlbertRogerUK", "key": ARL_KEY},
+    {"username": "AlbertRogerFrancEU", "key": ARF_KEY},
+    {"username": "AlbertRogerIberiEU", "key": ARIB_KEY},
+    {"username": "AlbertRogerNetheEU", "key": ARNL_KEY}
+]
+
+def parse_args():
+    arg_parser = build_parser("Download several Cin7 entities to CSV in one run.", store_mode='write',
+                              newest_first=True)
+    arg_parser.add_argument('--entities', nargs='+', choices=list(ENTITIES), default=DEFAULT_ENTITIES,
+                            help=f"Entities to extract (default {' '.join(DEFAULT_ENTITIES)}).")
+    arg_parser.add_argument('--users', nargs='+', choices=[user['username'] for user in USERS],
+                            help="Tenants to extract (default all).")
+    arg_parser.add_argument('--weight', nargs=2, action='append', default=[], metavar=('ENTITY', 'WEIGHT'),
+                            help="Share of each tenant's budget for an entity relative to the others in its lane "
+                                 "(default 1). Can be repeated.")
+    args = arg_parser.parse_args()
+    for name, weight in args.weight:
+        if name not in args.entities:
+            arg_parser.error(f"--weight {name}: not one of the selected entities ({' '.join(args.entities)})")
+        try:
+            float(weight)
+        except ValueError:
+            arg_parser.error(f"--weight {name}: {weight!r} is not a number")
+    return args
+
+def main():
+    args = parse_args()
+    configure(prefetch=args.prefetch, decoder=args.decoder, cache=args.cache, replay=args.replay,
+              retention=args.cache_retention, checkpoint=args.checkpoint, resume=args.resume,
+              checkpoint_dropbox=args.checkpoint_dropbox, fanout=args.fanout, keyset=args.keyset)
+    store = open_store(args.store, args.store_dropbox) if args.store else None
+
+    weights = {name: float(weight) for name, weight in args.weight}
+    specs = []
+    for name in args.entities:
+        module_name, file_name, lane = ENTITIES[name]
+        specs.append(EntitySpec.from_module(name, module_name, file_name, LANES[lane], weights.get(name, 1.0)))
+    users = [user for user in USERS if not args.users or user['username'] in args.users]
+
+    paths = run_entities(specs, users, args.output_format, store, grace_hours=args.newest_first)
+    close_clients()
+    write_metrics(os.path.join(OUTPUT_DIR, 'Extract_entities'))  # One summary covering every entity
+    if store:
+        save_store(store, args.store_dropbox)
+
+    # Export each path for the workflow as ENV_<ENTITY>_FILE / ENV_<ENTITY>_FILE_NAME
+    gh_env = os.getenv('GITHUB_ENV')
+    for name, path in paths.items():
+        logging.info(f"{name} written locally at {path}")
+        if gh_env:
+            with open(gh_env, "a") as env_file:
+                env_file.write(f"ENV_{name.upper()}_FILE={os.path.abspath(path)}\n")
+                env_file.write(f"ENV_{name.upper()}_FILE_NAME={os.path.basename(path)}\n")
+    if not gh_env:
+        logging.warning("GITHUB_ENV not set; cannot export the output paths.")
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,31 @@
-import time
-import requests
-import base64
 import datetime
-import csv
-from dateutil import parser
 import pytz
 import logging
 import os
+import sys
 from concurrent.futures import ThreadPoolExecutor
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cin7.client import get_client, close_clients, configure, date_where
+from cin7.dates import parse_date, format_date
+from cin7.store import open_store
+from cin7.cli import build_parser
+from cin7.pipeline import open_sink, intern_value
+from cin7.metrics import write_metrics
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Configuration
-BASE_URL = 'https://api.cin7.com/api/v1/PurchaseOrders'
+ENDPOINT = 'PurchaseOrders'
+DATE_FIELD = 'fullyReceivedDate'  # Filtered server-side so only the requested window is paged
 FIELDS = 'id,reference,company,firstName,lastName,projectName,source,currencyCode,currencyRate,lineItems,fullyReceivedDate,isVoid'
 ROWS_PER_PAGE = 250
 
+# Output columns, in the order process_purchase_order builds each row tuple
+COLUMNS = ['downloadSource', 'reference', 'company', 'firstName', 'lastName','projectName','source','currencyCode',
+           'lineItemcode', 'lineItemName',   'lineItemQty',  'lineItemUnitPrice', 'lineItemDiscount','lineItemoption3', 'fullyReceivedDate']
+
 ARL_KEY = os.environ["ARL_KEY"]
 ARIB_KEY = os.environ["ARIB_KEY"]
 ARNL_KEY = os.environ["ARNL_KEY"]
@@ -29,39 +38,13 @@ USERS = [
     {"username":"AlbertRogerNetheEU", "key": ARNL_KEY}
 ]
 
-def get_auth_header(username, key):
-    credentials = f"{username}:{key}"
-    encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-    return {'Authorization': f'Basic {encoded_credentials}', 'Content-Type': 'application/json'}
-
-def call_api(url, headers):
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json(), None
-    except requests.RequestException as e:
-        return None, str(e)
-
-def parse_date(date_string):
-    if not date_string:
-        return None
-    try:
-        parsed_date = parser.parse(date_string)
-        if parsed_date.tzinfo is None or parsed_date.tzinfo.utcoffset(parsed_date) is None:
-            parsed_date = pytz.utc.localize(parsed_date)
-        else:
-            parsed_date = parsed_date.astimezone(pytz.utc)
-        return parsed_date
-    except Exception as e:
-        logging.warning(f"Failed to parse date: {date_string}. Error: {e}")
-        return None
-
 def calculate_date_range():
     # Set the start and end dates for January 2025
     start_date = datetime.datetime(2025, 8, 1, tzinfo=pytz.utc)
     end_date = datetime.datetime(2025, 8, 31, 23, 59, 59, 999999, tzinfo=pytz.utc)
     return start_date, end_date
 
+# Safety net only: the API already applies the DATE_FIELD window
 def is_valid_purchase_order(purchase_order, start_date, end_date):
     invoice_date = parse_date(purchase_order.get('fullyReceivedDate'))
     return invoice_date and start_date <= invoice_date <= end_date
@@ -69,7 +52,7 @@ def is_valid_purchase_order(purchase_order, start_date, end_date):
 def process_purchase_order(purchase_order, user_name):
     line_items = purchase_order.get('lineItems', [])
     currency_rate = float(purchase_order.get('currencyRate', 1))
-    invoice_date = parse_date(purchase_order.get('fullyReceivedDate'))
+    invoice_date = format_date(purchase_order.get('fullyReceivedDate'))  # Once per order, not per line item
 
 
      # Create a dictionary to map full names to abbreviations
@@ -83,6 +66,14 @@ def process_purchase_order(purchase_order, user_name):
     # Get the abbreviation for the user_name, or use the original if not found
     abbreviated_user_name = user_abbreviations.get(user_name, user_name)
 
+    # Order-level values shared by every line item row; low-cardinality strings are interned
+    reference = purchase_order.get('reference')
+    company = intern_value(purchase_order.get('company'))
+    first_name = purchase_order.get('firstName', '')
+    last_name = purchase_order.get('lastName', '')
+    project_name = purchase_order.get('projectName', '')
+    source = intern_value(purchase_order.get('source', ''))
+    currency_code = intern_value(purchase_order.get('currencyCode', ''))
 
     results = []
     for item in line_items:
@@ -92,82 +83,75 @@ def process_purchase_order(purchase_order, user_name):
         adjusted_unit_price = round(unit_price * currency_rate, 2)
         adjusted_discount = round(discount * currency_rate, 2)
 
-        results.append({
-            'downloadSource': abbreviated_user_name,
-            'reference': purchase_order.get('reference'),
-            'company': purchase_order.get('company'),
-            'firstName': purchase_order.get('firstName', ''),
-            'lastName': purchase_order.get('lastName', ''),
-            'projectName': purchase_order.get('projectName', ''),
-            'source': purchase_order.get('source', ''),  
-            'currencyCode': purchase_order.get('currencyCode', ''),
-            'lineItemcode': item.get('code', ''),
-            'lineItemName': item.get('name', ''),
-            'lineItemQty': item.get('qty', ''),
-            'lineItemoption3': item.get('option3', ''),
-            'lineItemUnitPrice': adjusted_unit_price,
-            'lineItemDiscount': adjusted_discount,
-            'lineItemoption3': item.get('option3', ''),
-            'fullyReceivedDate': invoice_date.strftime('%d/%m/%Y') if invoice_date else ''
-        })
+        results.append((
+            abbreviated_user_name,
+            reference,
+            company,
+            first_name,
+            last_name,
+            project_name,
+            source,
+            currency_code,
+            item.get('code', ''),
+            item.get('name', ''),
+            item.get('qty', ''),
+            adjusted_unit_price,
+            adjusted_discount,
+            item.get('option3', ''),
+            invoice_date,
+        ))
 
     return results
 
-def process_user(user):
-    headers = get_auth_header(user['username'], user['key'])
-    start_date, end_date = calculate_date_range()
-    all_purchase_orders = []
-    page = 1
-
-    while True:
-        url = f'{BASE_URL}?fields={FIELDS}&page={page}&rows={ROWS_PER_PAGE}'
-        logging.info(f"Fetching page {page} for user {user['username']}...")
+def process_page(data, user_name, start_date, end_date):
+    page_purchase_orders = []
+    for purchase_order in data:
+        if is_valid_purchase_order(purchase_order, start_date, end_date):
+            page_purchase_orders.extend(process_purchase_order(purchase_order, user_name))
+    return page_purchase_orders
 
-        data, error = call_api(url, headers)
-        if error:
-            logging.error(f"API call failed for user {user['username']}: {error}")
-            break
-
-        if not data:
-            logging.info(f"No more data to fetch for user {user['username']}.")
-            break
+def process_user(user, store=None, sink=None):
+    client = get_client(user['username'], user['key'])
+    start_date, end_date = calculate_date_range()
+    where = date_where(DATE_FIELD, start_date, end_date)
 
-        for purchase_order in data:
-            if is_valid_purchase_order(purchase_order, start_date, end_date):
-                all_purchase_orders.extend(process_purchase_order(purchase_order, user['username']))
+    if store:
+        # Rebuild from the local order store instead of paging the API
+        for data in store.iter_pages(ENDPOINT, user['username'], DATE_FIELD, start_date, end_date):
+            sink.write(process_page(data, user['username'], start_date, end_date))
+        return
 
-        logging.info(f"Page {page} processed for user {user['username']}.")
-        page += 1
-        time.sleep(0.5)  # Rate limiting
+    pages = client.iter_pages(ENDPOINT, {'fields': FIELDS, 'where': where, 'rows': ROWS_PER_PAGE})
+    for page, data in pages:
+        sink.write(process_page(data, user['username'], start_date, end_date))
 
-    return all_purchase_orders
+def parse_args():
+    return build_parser("Download Cin7 purchase orders received in a fixed date range to CSV.", store_mode='read').parse_args()
 
 def main():
+    args = parse_args()
+    configure(prefetch=args.prefetch, decoder=args.decoder, cache=args.cache, replay=args.replay,
+              retention=args.cache_retention, checkpoint=args.checkpoint, resume=args.resume,
+              checkpoint_dropbox=args.checkpoint_dropbox, fanout=args.fanout, keyset=args.keyset)
+    store = open_store(args.from_store, args.store_dropbox) if args.from_store else None
     start_date, end_date = calculate_date_range()
     
-    fieldnames = ['downloadSource', 'reference', 'company', 'firstName', 'lastName','projectName','source','currencyCode', 
-    'lineItemcode', 'lineItemName',   'lineItemQty',  'lineItemUnitPrice', 'lineItemDiscount','lineItemoption3', 'fullyReceivedDate'] 
-    
     file_name = f"Purchase_Orders_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.csv"  
 
       # Saves it in a temporal file 
     output_filename = os.path.join("tmp_files", file_name)
     os.makedirs("tmp_files", exist_ok=True)
-    all_purchase_orders = []
-
-
-# Process users in parallel
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        results = executor.map(process_user, USERS)
-        for user_purchase_orders in results:
-            all_purchase_orders.extend(user_purchase_orders)
 
-    # Write all purchase orders to a single CSV file
-    with open(output_filename, mode='w', newline='', encoding='utf-8') as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        writer.writeheader()
-        for purchase_order in all_purchase_orders:
-            writer.writerow(purchase_order)
+    # Process users in parallel, streaming each page to the CSV file as it is transformed
+    sink = open_sink(output_filename, COLUMNS, args.output_format, DATE_FIELD)
+    output_filename = sink.path
+    with sink:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda user: process_user(user, store, sink), USERS))
+    close_clients()
+    write_metrics(output_filename)
+    if store:
+        store.close()
 
     logging.info(f"Data successfully written to {file_name}")
 
@@ -1,24 +1,34 @@
-import time
-import requests
-import base64
 import datetime
 import csv
-from dateutil import parser
 import pytz
 import logging
 import os
+import sys
 errores_globales = []
 from concurrent.futures import ThreadPoolExecutor
-from api_tracker import log_api_call, get_api_usage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cin7.client import get_client, close_clients, configure, date_where
+from cin7.dates import parse_date, format_date
+from cin7.sync_state import SyncState, STATE_FILE, incremental_where
+from cin7.store import open_store, save_store
+from cin7.cli import build_parser
+from cin7.pipeline import open_sink, intern_value
+from cin7.metrics import write_metrics
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Configuration
-BASE_URL = 'https://api.cin7.com/api/v1/SalesOrders'
-FIELDS = 'id,reference,customerOrderNo,salesReference,invoiceDate,createdDate,estimatedDeliveryDate,dispatchedDate,company,firstName,lastName,projectName,source,currencyCode,currencyRate,deliveryCountry,branchId,lineItems,discountTotal,completedDate,invoiceNumber,taxRate,accountingAttributes'
+ENDPOINT = 'SalesOrders'
+DATE_FIELD = 'invoiceDate'  # Filtered server-side so only the requested window is paged
+FIELDS = 'id,reference,customerOrderNo,salesReference,invoiceDate,createdDate,estimatedDeliveryDate,dispatchedDate,company,firstName,lastName,projectName,source,currencyCode,currencyRate,deliveryCountry,branchId,lineItems,discountTotal,completedDate,invoiceNumber,taxRate,accountingAttributes,customFields,modifiedDate'
 ROWS_PER_PAGE = 250
 
+# Output columns, in the order process_sales_orders builds each row tuple
+COLUMNS = ['sourceUser','accountingAttributes','reference', 'invoiceNumber','customerOrderNo','createdDate','estimatedDeliveryDate','dispatchedDate','company', 'firstName', 'lastName', 'projectName',
+           'channel', 'taxRate','currencyCode','deliveryCountry','branchId','lineItemcode', 'lineItemName','lineItemQty','lineItemoption3', 'lineItemUnitPrice', 'lineItemDiscount', 'discountTotal','invoiceDate']
+
 ARL_KEY = os.environ["ARL_KEY"]
 ARIB_KEY = os.environ["ARIB_KEY"]
 ARNL_KEY = os.environ["ARNL_KEY"]
@@ -32,39 +42,6 @@ USERS = [
     {"username": "AlbertRogerNetheEU", "key": ARNL_KEY}
 ]
 
-def get_auth_header(username, key):
-    credentials = f"{username}:{key}"
-    encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-    return {'Authorization': f'Basic {encoded_credentials}', 'Content-Type': 'application/json'}
-
-def call_api(url, headers):
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json(), None
-    except requests.RequestException as e:
-        return None, str(e)
-
-def parse_date(date_string):
-    if not date_string:
-        return None
-
-    try:
-        parsed_date = parser.parse(date_string)
-        if parsed_date.tzinfo is None or parsed_date.tzinfo.utcoffset(parsed_date) is None:
-            parsed_date = pytz.utc.localize(parsed_date)
-        else:
-            parsed_date = parsed_date.astimezone(pytz.utc)
-        return parsed_date
-    except ValueError as e:
-        # Handle specific parsing errors
-        logging.warning(f"Failed to parse date: {date_string}. Error: {e}")
-        return None
-    except Exception as e:
-        # Catch any unexpected exceptions and log them
-        logging.error(f"Unexpected error parsing date: {date_string}. Error: {e}")
-        return None
-
 def calculate_date_range():
     # Set the start and end dates for the year 2024
     start_date = datetime.datetime(2024, 1, 1, tzinfo=pytz.utc)  # (Year, Month, Day, Hour, Minute, Second, ...,)
@@ -72,6 +49,7 @@ def calculate_date_range():
 
     return start_date, end_date
 
+# Safety net only: the API already applies the DATE_FIELD window
 def is_valid_sales_orders(sales_orders, start_date, end_date):
     if 'invoiceDate' not in sales_orders:
         return False
@@ -84,12 +62,31 @@ def is_valid_sales_orders(sales_orders, start_date, end_date):
 
 def process_sales_orders(sales_orders, user_name):
     line_items = sales_orders.get('lineItems', [])
+    if not line_items:
+        return []
+
     currency_rate = float(sales_orders.get('currencyRate', 1))
-    invoice_date = parse_date(sales_orders.get('invoiceDate'))
-    dispatch_date = parse_date(sales_orders.get('dispatchedDate'))
-    estimated_delivery_date = parse_date(sales_orders.get('estimatedDeliveryDate'))
+    # Parsed and formatted once per order, not once per line item
+    invoice_date = format_date(sales_orders.get('invoiceDate'))
+    dispatch_date = parse_date(sales_orders.get('dispatchedDate')).strftime('%d/%m/%Y') if invoice_date else ''
+    estimated_delivery_date = parse_date(sales_orders.get('estimatedDeliveryDate')).strftime('%d/%m/%Y') if invoice_date else ''
     discount_total = sales_orders.get('discountTotal', 0)
 
+    # Order-level values shared by every line item row; low-cardinality strings are interned
+    accounting_status = intern_value(sales_orders.get('accountingAttributes').get('accountingImportStatus'))
+    reference = sales_orders.get('reference')
+    invoice_number = sales_orders.get('invoiceNumber')
+    customer_order_no = sales_orders.get('customerOrderNo')
+    company = intern_value(sales_orders.get('company'))
+    first_name = sales_orders.get('firstName')
+    last_name = sales_orders.get('lastName')
+    project_name = sales_orders.get('projectName')
+    channel = intern_value(sales_orders.get('source'))
+    tax_rate = sales_orders.get('taxRate')
+    currency_code = intern_value(sales_orders.get('currencyCode'))
+    delivery_country = intern_value(sales_orders.get('deliveryCountry'))
+    branch_id = sales_orders.get('branchId')
+
     # Create a dictionary to map full names to abbreviations
     user_abbreviations = {
         "AlbertRogerUK": "ARL",
@@ -114,120 +111,161 @@ def process_sales_orders(sales_orders, user_name):
         # Distribute discountTotal across all products
         adjusted_discount_total = round((discount_total / num_products) * currency_rate, 2)
 
-        results.append({
-            'sourceUser': abbreviated_user_name,
-            'accountingAttributes':sales_orders.get('accountingAttributes').get('accountingImportStatus'),
-            'reference': sales_orders.get('reference'),
-            'invoiceNumber': sales_orders.get('invoiceNumber'),
-            'customerOrderNo': sales_orders.get('customerOrderNo'),
-            'createdDate': item.get('createdDate', ''),
-            'estimatedDeliveryDate': estimated_delivery_date.strftime('%d/%m/%Y') if invoice_date else '',
-            'dispatchedDate': dispatch_date.strftime('%d/%m/%Y') if invoice_date else '',
-            'company': sales_orders.get('company'),
-            'firstName': sales_orders.get('firstName'),
-            'lastName': sales_orders.get('lastName'),
-            'projectName': sales_orders.get('projectName'),
-            'channel': sales_orders.get('source'),
-            'taxRate':sales_orders.get('taxRate'),
-            'currencyCode': sales_orders.get('currencyCode'),
-            'deliveryCountry':sales_orders.get('deliveryCountry'),
-            'branchId': sales_orders.get('branchId'),
-            'lineItemcode': item.get('code', ''),
-            'lineItemName': item.get('name', ''),
-            'lineItemQty': item.get('qty', ''),
-            'lineItemoption3': item.get('option3', ''),
-            'lineItemUnitPrice': adjusted_unit_price,
-            'lineItemDiscount': adjusted_discount,
-            'discountTotal': adjusted_discount_total,
-            'invoiceDate': invoice_date.strftime('%d/%m/%Y') if invoice_date else ''
-        })
+        results.append((
+            abbreviated_user_name,
+            accounting_status,
+            reference,
+            invoice_number,
+            customer_order_no,
+            item.get('createdDate', ''),
+            estimated_delivery_date,
+            dispatch_date,
+            company,
+            first_name,
+            last_name,
+            project_name,
+            channel,
+            tax_rate,
+            currency_code,
+            delivery_country,
+            branch_id,
+            item.get('code', ''),
+            item.get('name', ''),
+            item.get('qty', ''),
+            item.get('option3', ''),
+            adjusted_unit_price,
+            adjusted_discount,
+            adjusted_discount_total,
+            invoice_date,
+        ))
     
     return results
 
-def process_user(user):
-    headers = get_auth_header(user['username'], user['key'])
-    start_date, end_date = calculate_date_range()
-    all_sales_orders = []
-    page = 1
+def process_page(data, user_name, start_date, end_date):
+    page_sales_orders = []
+    for sales_orders in data:
+        try:
+            if is_valid_sales_orders(sales_orders, start_date, end_date):
+                page_sales_orders.extend(process_sales_orders(sales_orders, user_name))
+        except Exception as e:
+            #logging.error(f"Error processing sales order: {sales_orders}. Error: {e}") (logging now in csv file)
+            errores_globales.append({
+                'user': user_name,
+                'order_id': sales_orders.get('id'),
+                'reference': sales_orders.get('reference'),
+                'error': str(e),
+                'timestamp': datetime.datetime.utcnow().isoformat()
+            })
+    return page_sales_orders
+
+def write_errors(errores_filename="errores_sales_orders.csv"):
+    """Write the orders that failed to transform (always create the file)."""
+    with open(errores_filename, mode='w', newline='', encoding='utf-8') as error_file:
+        fieldnames = ["user", "order_id", "reference", "error", "timestamp"]
+        writer = csv.DictWriter(error_file, fieldnames=fieldnames)
+        writer.writeheader()
+        for err in errores_globales:
+            writer.writerow(err)
 
-    print(f"Starting {user['username']} with API Usage: {get_api_usage(user['username'])['api_calls']} calls")
+    logging.info(f"Errores file written locally at {errores_filename}")
 
-    while True:
-        # Check and log API call before making a request
-        if not log_api_call(user['username']):
-            logging.info(f"API limit reached for {user['username']}. Waiting for the next opportunity.")
-            continue  # Skip API call if limit reached
+def process_stored_user(user, store, sink):
+    """Rebuild a user's rows from the local store (no API calls)."""
+    start_date, end_date = calculate_date_range()
+    for data in store.iter_pages(ENDPOINT, user['username'], DATE_FIELD, start_date, end_date):
+        sink.write(process_page(data, user['username'], start_date, end_date))
 
-        url = f'{BASE_URL}?fields={FIELDS}&page={page}&rows={ROWS_PER_PAGE}'
-        logging.info(f"Fetching page {page} for user {user['username']}...")
+def process_user(user, state=None, store=None, sink=None):
+    client = get_client(user['username'], user['key'])
+    start_date, end_date = calculate_date_range()
+    where = date_where(DATE_FIELD, start_date, end_date)
 
-        data, error = call_api(url, headers)
-        if error:
-            logging.error(f"API call failed for user {user['username']}: {error}")
-            break
+    # Incremental mode: only fetch orders modified since the last successful run
+    watermark = state.get_watermark(user['username'], ENDPOINT) if state else None
+    where = incremental_where(where, watermark)
+    newest_modified = watermark
 
-        if not data:
-            logging.info(f"No more data to fetch for user {user['username']}.")
-            break
+    print(f"Starting {user['username']} with API Usage: {client.limiter.usage()['api_calls']} calls")
 
+    pages = client.iter_pages(ENDPOINT, {'fields': FIELDS, 'where': where, 'rows': ROWS_PER_PAGE})
+    for page, data in pages:
         for sales_orders in data:
-            try:
-                if is_valid_sales_orders(sales_orders, start_date, end_date):
-                    all_sales_orders.extend(process_sales_orders(sales_orders, user['username']))
-            except Exception as e:
-                #logging.error(f"Error processing sales order: {sales_orders}. Error: {e}") (logging now in csv file)
-                errores_globales.append({
-                    'user': user['username'],
-                    'order_id': sales_orders.get('id'),
-                    'reference': sales_orders.get('reference'),
-                    'error': str(e),
-                    'timestamp': datetime.datetime.utcnow().isoformat()
-    })
-
-        logging.info(f"Page {page} processed for user {user['username']}.")
-        page += 1
-        time.sleep(0.5)  # Enforce rate limiting
-
-    return all_sales_orders
+            modified_date = parse_date(sales_orders.get('modifiedDate'))
+            if modified_date and (newest_modified is None or modified_date > newest_modified):
+                newest_modified = modified_date
+
+        if store:
+            store.upsert(ENDPOINT, user['username'], data)
+        if not (state and store):  # Incremental + store rebuilds every row from the store afterwards
+            sink.write(process_page(data, user['username'], start_date, end_date))
+
+    # Only move the watermark forward once the tenant was fully paged
+    if state and pages.completed and newest_modified:
+        state.set_watermark(user['username'], ENDPOINT, newest_modified)
+
+def parse_args():
+    arg_parser = build_parser("Download Cin7 sales orders to CSV.", store_mode='write')
+    arg_parser.add_argument('--incremental', action='store_true',
+                            help="Only fetch orders modified since the last successful run.")
+    arg_parser.add_argument('--state-file', default=STATE_FILE,
+                            help="Local file holding the modifiedDate watermarks.")
+    arg_parser.add_argument('--state-dropbox',
+                            help="Dropbox path to pull the state from before the run and push it to afterwards.")
+    return arg_parser.parse_args()
 
 def main():
+    args = parse_args()
+    configure(prefetch=args.prefetch, decoder=args.decoder, cache=args.cache, replay=args.replay,
+              retention=args.cache_retention, checkpoint=args.checkpoint, resume=args.resume,
+              checkpoint_dropbox=args.checkpoint_dropbox, fanout=args.fanout, keyset=args.keyset)
     start_date, end_date = calculate_date_range()
-    
-    fieldnames = ['sourceUser','accountingAttributes','reference', 'invoiceNumber','customerOrderNo','createdDate','estimatedDeliveryDate','dispatchedDate','company', 'firstName', 'lastName', 'projectName', 
-                  'channel', 'taxRate','currencyCode','deliveryCountry','branchId','lineItemcode', 'lineItemName','lineItemQty','lineItemoption3', 'lineItemUnitPrice', 'lineItemDiscount', 'discountTotal','invoiceDate']
+
+    state = None
+    if args.incremental:
+        state = SyncState(args.state_file)
+        if args.state_dropbox:
+            state.pull(args.state_dropbox)
+        else:
+            state.load()
+
+    store = open_store(args.store, args.store_dropbox) if args.store else None
     
     file_name = f"Sales_Orders_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.csv"
+    if state and not store:
+        # Incremental runs only contain the orders that changed, so keep them apart from the full extract
+        file_name = f"Sales_Orders_changes_{datetime.datetime.now(pytz.utc).strftime('%Y%m%d%H%M')}.csv"
 
        # Saves it in a temporal file 
     output_filename = file_name
     os.makedirs("tmp_files", exist_ok=True)
-    all_sales_orders = []
 
-    # Process users in parallel
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        results = executor.map(process_user, USERS)
-        for user_sales_orders in results:
-            all_sales_orders.extend(user_sales_orders)
-
-    # Write all sales orders to a single CSV file
-    with open(output_filename, mode='w', newline='', encoding='utf-8') as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        writer.writeheader()
-        for sales_orders in all_sales_orders:
-            writer.writerow(sales_orders)
+    # Process users in parallel, streaming each page to the CSV file as it is transformed
+    sink = open_sink(output_filename, COLUMNS, args.output_format, DATE_FIELD)
+    output_filename = sink.path
+    with sink:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda user: process_user(user, state, store, sink), USERS))
+
+        if state and store:
+            # The incremental pull only refreshed the store; the full extract comes from the store
+            for user in USERS:
+                process_stored_user(user, store, sink)
+    close_clients()
+    write_metrics(output_filename)
+
+    if store:
+        save_store(store, args.store_dropbox)
+
+    if state:
+        if args.state_dropbox:
+            state.push(args.state_dropbox)
+        else:
+            state.save()
 
     logging.info(f"Data successfully written locally at {output_filename}")
 
         # Write errors to a CSV file (always create it)
-    errores_filename = "errores_sales_orders.csv"
-    with open(errores_filename, mode='w', newline='', encoding='utf-8') as error_file:
-        fieldnames = ["user", "order_id", "reference", "error", "timestamp"]
-        writer = csv.DictWriter(error_file, fieldnames=fieldnames)
-        writer.writeheader()
-        for err in errores_globales:
-            writer.writerow(err)
-
-    logging.info(f"Errores file written locally at {errores_filename}")
+    write_errors()
 
 
 # Export the EXACT path for the workflow
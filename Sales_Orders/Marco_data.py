@@ -1,22 +1,33 @@
-import time
-import requests
-import base64
 import datetime
-import pandas as pd
-from dateutil import parser
 import pytz
 import logging
 import os
+import sys
 from concurrent.futures import ThreadPoolExecutor
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cin7.client import get_client, close_clients, configure, date_where
+from cin7.dates import parse_date, format_date
+from cin7.store import open_store
+from cin7.cli import build_parser
+from cin7.pipeline import open_sink, intern_value
+from cin7.metrics import write_metrics
+from cin7.warehouse import classify
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Configuration
-BASE_URL = 'https://api.cin7.com/api/v1/SalesOrders'
+ENDPOINT = 'SalesOrders'
+DATE_FIELD = 'invoiceDate'  # Filtered server-side so only the requested window is paged
 FIELDS = 'id,reference,customerOrderNo,salesReference,invoiceDate,createdDate,company,firstName,lastName,branchId,projectName,source,currencyCode,currencyRate,lineItems,discountTotal,completedDate,invoiceNumber,customFields'
 ROWS_PER_PAGE = 250
 
+# Output columns, in the order process_sales_orders builds each row tuple
+COLUMNS = ['sourceUser', 'reference', 'company', 'firstName', 'lastName', 'createdDate', 'branchId',
+           'currencyCode', 'lineItemcode', 'lineItemQty', 'lineItemUnitPrice', 'lineItemoption3',
+           'customFieldsorders_1001', 'lineItemDiscount', 'discountTotal', 'invoiceDate', 'Warehouse']
+
 ARL_KEY = os.environ["ARL_KEY"]
 ARIB_KEY = os.environ["ARIB_KEY"]
 ARNL_KEY = os.environ["ARNL_KEY"]
@@ -30,110 +41,6 @@ USERS = [
     {"username": "AlbertRogerNetheEU", "key": ARNL_KEY}
 ]
 
-def classify_entity(row):
-    company = str(row["company"]).upper()
-    source_user = str(row["sourceUser"])  # Use sourceUser here
-    branch_id = str(row["branchId"]).upper()
-    
-    # Ensure item_code is retrieved correctly
-    item_code = str(row.get("Item Code", "")).upper()
-    
-    # User Abbreviations
-    user_abbreviations = {
-        "AlbertRogerUK": "ARL",
-        "AlbertRogerNetheEU": "ARNL",
-        "AlbertRogerFrancEU": "ARF",
-        "AlbertRogerIberiEU": "ARIB"
-    }
-    
-    # Get abbreviated username or original if not found
-    abbreviated_user = user_abbreviations.get(source_user, source_user)
-
-    user_and_branch = f"{abbreviated_user}{branch_id}"  # Combined sourceUser and branch ID
-
-    # Classification based on company name
-    if "ALBERT ROGER" in company and company != "ALBERT ROGER IBERICA":
-        return "XWh"
-    elif "TESTER" in company:
-        return "XWh"
-    elif "CARREFOUR" in company:
-        return "XWH"
-
-    if f"{abbreviated_user}{branch_id}{item_code[:4]}" == "ARN398RECF":
-        return source_user + "-LGI"
-
-    # Check line items if present
-    line_items = row.get('lineItems', [])
-
-    for line_item in line_items:
-        item_code = str(line_item.get('lineItemcode', '')).upper()
-        if user_and_branch == "ARL726" and item_code.startswith("NBNA"):
-            return source_user+ "-P&P"
-
-
-    # Classification based on combined user and branch
-    if user_and_branch in ["ARL726", "ARL3", "ARL916", "ARL977", "ARL1007"]:
-        return source_user + "-P&P"
-    elif user_and_branch in ["ARL777", "ARL4", "ARL5", "ARL863", "ARL47", "ARL779", "ARL856", "ARL875",
-                             "ARL1019", "ARL937", "ARL936", "ARIB3", "ARF179", "ARF3", "ARF378",
-                             "ARF262", "ARF402", "ARF454"]:
-        return source_user +"-BCN"
-   
-    elif user_and_branch in ["ARL969"]:
-        return source_user +"-PCC"
-   
-    elif user_and_branch in ["ARL970", "ARL997"]:
-        return source_user +"-DMW"
-   
-    elif user_and_branch == "ARL997":
-        return source_user +"-DMW Promo"
-   
-    elif user_and_branch in ["ARF180", "ARNL130", "ARNL132", "ARNL3", "ARNL336"]:
-        return source_user +"-NCP"
-    elif user_and_branch == "ARF184":
-        return source_user +"-BLN"
-   
-    elif user_and_branch == "ARF182":
-        return source_user +"-LGI"
-   
-    elif user_and_branch == "ARF277":
-        return "XWH"
-
-    # Default case
-    return None
-
-
-def get_auth_header(username, key):
-    credentials = f"{username}:{key}"
-    encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-    return {'Authorization': f'Basic {encoded_credentials}', 'Content-Type': 'application/json'}
-
-def call_api(url, headers):
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json(), None
-    except requests.RequestException as e:
-        return None, str(e)
-
-def parse_date(date_string):
-    if not date_string:
-        return None
-
-    try:
-        parsed_date = parser.parse(date_string)
-        if parsed_date.tzinfo is None or parsed_date.tzinfo.utcoffset(parsed_date) is None:
-            parsed_date = pytz.utc.localize(parsed_date)
-        else:
-            parsed_date = parsed_date.astimezone(pytz.utc)
-        return parsed_date
-    except ValueError as e:
-        return None
-    except Exception as e:
-  
-        return None
-
-
 def calculate_date_range():
     # Set the start and end dates for the year 2024
     start_date = datetime.datetime(2024, 1, 1, tzinfo=pytz.utc)  
@@ -141,6 +48,7 @@ def calculate_date_range():
 
     return start_date, end_date
 
+# Safety net only: the API already applies the DATE_FIELD window
 def is_valid_sales_orders(sales_orders, start_date, end_date):
     if 'invoiceDate' not in sales_orders:
         return False
@@ -156,11 +64,23 @@ def is_valid_sales_orders(sales_orders, start_date, end_date):
 
 def process_sales_orders(sales_orders, user_name):
     line_items = sales_orders.get('lineItems', [])
+    if not line_items:
+        return []
+
     currency_rate = float(sales_orders.get('currencyRate', 1))
-    invoice_date = parse_date(sales_orders.get('invoiceDate'))
-    created_date = parse_date(sales_orders.get('createdDate'))
+    # Formatted once per order, not once per line item
+    invoice_date = format_date(sales_orders.get('invoiceDate'))
+    created_date = format_date(sales_orders.get('createdDate'))
     discount_total = sales_orders.get('discountTotal', 0)
-   
+
+    # Order-level values shared by every line item row; low-cardinality strings are interned
+    reference = sales_orders.get('reference')
+    company = intern_value(sales_orders.get('company'))
+    first_name = sales_orders.get('firstName')
+    last_name = sales_orders.get('lastName')
+    branch_id = sales_orders.get('branchId','')
+    currency_code = intern_value(sales_orders.get('currencyCode'))
+    custom_orders_1001 = intern_value(sales_orders.get('customFields').get('orders_1001'))
 
     # Create a dictionary to map full names to abbreviations
     user_abbreviations = {
@@ -185,88 +105,80 @@ def process_sales_orders(sales_orders, user_name):
         adjusted_discount = round(discount * currency_rate, 2)
         adjusted_discount_total = round((discount_total / num_products) * currency_rate, 2)
 
-        results.append({
-            'sourceUser': abbreviated_user_name,
-            'reference': sales_orders.get('reference'),
-            'company': sales_orders.get('company'),
-            'firstName': sales_orders.get('firstName'),
-            'lastName': sales_orders.get('lastName'),
-            'createdDate': created_date.strftime('%d/%m/%Y') if created_date else '',
-            'branchId': sales_orders.get('branchId',''),
-            'currencyCode': sales_orders.get('currencyCode'),
-            'lineItemcode': item.get('code', ''),
-            'lineItemQty': item.get('qty', ''),
-            'lineItemUnitPrice': adjusted_unit_price,
-            'lineItemoption3': item.get('option3', ''),
-            'customFieldsorders_1001': sales_orders.get('customFields').get('orders_1001'),
-            'lineItemDiscount': adjusted_discount,
-            'discountTotal': adjusted_discount_total,            
-            'invoiceDate': invoice_date.strftime('%d/%m/%Y') if invoice_date else ''
-        })
+        results.append((
+            abbreviated_user_name,
+            reference,
+            company,
+            first_name,
+            last_name,
+            created_date,
+            branch_id,
+            currency_code,
+            item.get('code', ''),
+            item.get('qty', ''),
+            adjusted_unit_price,
+            item.get('option3', ''),
+            custom_orders_1001,
+            adjusted_discount,
+            adjusted_discount_total,
+            invoice_date,
+            classify(abbreviated_user_name, branch_id, company, item.get('code', '')),
+        ))
     
     return results
     
 
-def process_user(user):
-    headers = get_auth_header(user['username'], user['key'])
-    start_date, end_date = calculate_date_range()
-    all_sales_orders = []
-    page = 1
-
-    while True:
-        url = f'{BASE_URL}?fields={FIELDS}&page={page}&rows={ROWS_PER_PAGE}'
-        logging.info(f"Fetching page {page} for user {user['username']}...")
+def process_page(data, user_name, start_date, end_date):
+    page_sales_orders = []
+    for sales_orders in data:
+        try:
+            if is_valid_sales_orders(sales_orders, start_date, end_date):
+                page_sales_orders.extend(process_sales_orders(sales_orders, user_name))
+        except Exception as e:
+            logging.error(f"Error processing sales order {sales_orders.get('reference', 'Unknown Reference')}: {sales_orders}. Error: {e}")
 
-        data, error = call_api(url, headers)
-        if error:
-            logging.error(f"API call failed for user {user['username']}: {error}")
-            # Continue to the next page or break based on your requirements
-            break
+    return page_sales_orders
 
-        if not data:
-            logging.info(f"No more data to fetch for user {user['username']}.")
-            break
+def process_user(user, store=None, sink=None):
+    client = get_client(user['username'], user['key'])
+    start_date, end_date = calculate_date_range()
+    where = date_where(DATE_FIELD, start_date, end_date)
 
-        for sales_orders in data:
-            try:
-                if is_valid_sales_orders(sales_orders, start_date, end_date):
-                    all_sales_orders.extend(process_sales_orders(sales_orders, user['username']))
-            except Exception as e:
-                logging.error(f"Error processing sales order {sales_orders.get('reference', 'Unknown Reference')}: {sales_orders}. Error: {e}")
+    if store:
+        # Rebuild from the local order store instead of paging the API
+        for data in store.iter_pages(ENDPOINT, user['username'], DATE_FIELD, start_date, end_date):
+            sink.write(process_page(data, user['username'], start_date, end_date))
+        return
 
-        logging.info(f"Page {page} processed for user {user['username']}.")
-        page += 1
-        time.sleep(0.5)  # Rate limiting
+    pages = client.iter_pages(ENDPOINT, {'fields': FIELDS, 'where': where, 'rows': ROWS_PER_PAGE})
+    for page, data in pages:
+        sink.write(process_page(data, user['username'], start_date, end_date))
 
-    return all_sales_orders
+def parse_args():
+    return build_parser("Download Cin7 sales orders with warehouse classification to Excel.", store_mode='read',
+                        output_formats=('xlsx', 'parquet')).parse_args()
 
 def main():
+    args = parse_args()
+    configure(prefetch=args.prefetch, decoder=args.decoder, cache=args.cache, replay=args.replay,
+              retention=args.cache_retention, checkpoint=args.checkpoint, resume=args.resume,
+              checkpoint_dropbox=args.checkpoint_dropbox, fanout=args.fanout, keyset=args.keyset)
+    store = open_store(args.from_store, args.store_dropbox) if args.from_store else None
     start_date, end_date = calculate_date_range()
     
-    fieldnames = ['sourceUser', 'reference', 'company', 'firstName', 'lastName', 'createdDate', 'branchId',
-                  'currencyCode', 'lineItemcode', 'lineItemQty', 'lineItemUnitPrice', 'lineItemoption3',
-                  'customFieldsorders_1001', 'lineItemDiscount', 'discountTotal', 'invoiceDate']
-    
     os.makedirs("tmp_files", exist_ok=True)
     file_name = f"tmp_files/Sales_Orders_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.xlsx"
 
-    
-    all_sales_orders = []
-
-    # Process users in parallel
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        results = executor.map(process_user, USERS)
-        for user_sales_orderss in results:
-            all_sales_orders.extend(user_sales_orderss)
-
-    # Create DataFrame
-    df = pd.DataFrame(all_sales_orders, columns=fieldnames)
-    
-    # Apply classification function
-    df["Warehouse"] = df.apply(classify_entity, axis=1)
-    
-    # Save to Excel
-    df.to_excel(file_name, index=False, engine='openpyxl')
+    # Process users in parallel, streaming classified rows into the workbook as pages arrive
+    sink = open_sink(file_name, COLUMNS, args.output_format, DATE_FIELD)
+    file_name = sink.path
+    with sink:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda user: process_user(user, store, sink), USERS))
+    close_clients()
+    write_metrics(file_name)
+    if store:
+        store.close()
     
     env_file = os.getenv('GITHUB_ENV')
     with open(env_file, "a") as env_file:
@@ -1,22 +1,31 @@
-import time
-import requests
-import base64
 import datetime
-import csv
-from dateutil import parser
 import pytz
 import logging
 import os
+import sys
 from concurrent.futures import ThreadPoolExecutor
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cin7.client import get_client, close_clients, configure, date_where
+from cin7.dates import parse_date, format_date
+from cin7.store import open_store
+from cin7.cli import build_parser
+from cin7.pipeline import open_sink, intern_value
+from cin7.metrics import write_metrics
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Configuration
-BASE_URL = 'https://api.cin7.com/api/v1/SalesOrders'
+ENDPOINT = 'SalesOrders'
+DATE_FIELD = 'invoiceDate'  # Filtered server-side so only the requested window is paged
 FIELDS = 'id,reference,customerOrderNo,salesReference,invoiceDate,estimatedDeliveryDate,company,firstName,lastName,projectName,source,currencyCode,currencyRate,lineItems,discountTotal,completedDate,invoiceNumber,taxRate'
 ROWS_PER_PAGE = 250
 
+# Output columns, in the order process_sales_orders builds each row tuple
+COLUMNS = ['sourceUser','reference', 'invoiceNumber','customerOrderNo','estimatedDeliveryDate','company', 'firstName', 'lastName', 'projectName',
+           'channel', 'currencyCode','lineItemcode', 'lineItemName','lineItemQty','lineItemoption3', 'lineItemUnitPrice', 'lineItemDiscount', 'discountTotal','invoiceDate']
+
 ARL_KEY = os.environ["ARL_KEY"]
 ARIB_KEY = os.environ["ARIB_KEY"]
 ARNL_KEY = os.environ["ARNL_KEY"]
@@ -30,38 +39,6 @@ USERS = [
     {"username": "AlbertRogerNetheEU", "key": ARNL_KEY}
 ]
 
-def get_auth_header(username, key):
-    credentials = f"{username}:{key}"
-    encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-    return {'Authorization': f'Basic {encoded_credentials}', 'Content-Type': 'application/json'}
-
-def call_api(url, headers):
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json(), None
-    except requests.RequestException as e:
-        return None, str(e)
-
-def parse_date(date_string):
-    if not date_string:
-        return None
-
-    try:
-        parsed_date = parser.parse(date_string)
-        if parsed_date.tzinfo is None or parsed_date.tzinfo.utcoffset(parsed_date) is None:
-            parsed_date = pytz.utc.localize(parsed_date)
-        else:
-            parsed_date = parsed_date.astimezone(pytz.utc)
-        return parsed_date
-    except ValueError as e:
-        # Handle specific parsing errors
-        logging.warning(f"Failed to parse date: {date_string}. Error: {e}")
-        return None
-    except Exception as e:
-        # Catch any unexpected exceptions and log them
-        logging.error(f"Unexpected error parsing date: {date_string}. Error: {e}")
-        return None
 def calculate_date_range():
     # Set the start and end dates for the year 2024
     start_date = datetime.datetime(2025, 8, 1, tzinfo=pytz.utc)  # (Year, Month, Day, Hour, Minute, Second, ...,)
@@ -69,6 +46,7 @@ def calculate_date_range():
 
     return start_date, end_date
 
+# Safety net only: the API already applies the DATE_FIELD window
 def is_valid_sales_orders(sales_orders, start_date, end_date):
     if 'invoiceDate' not in sales_orders:
         logging.warning("Sales order missing 'invoiceDate'.")
@@ -84,11 +62,26 @@ def is_valid_sales_orders(sales_orders, start_date, end_date):
 
 def process_sales_orders(sales_orders, user_name):
     line_items = sales_orders.get('lineItems', [])
+    if not line_items:
+        return []
+
     currency_rate = float(sales_orders.get('currencyRate', 1))
-    invoice_date = parse_date(sales_orders.get('invoiceDate'))
-    estimated_delivery_date = parse_date(sales_orders.get('estimatedDeliveryDate'))
+    # Parsed and formatted once per order, not once per line item
+    invoice_date = format_date(sales_orders.get('invoiceDate'))
+    estimated_delivery_date = parse_date(sales_orders.get('estimatedDeliveryDate')).strftime('%d/%m/%Y') if invoice_date else ''
     discount_total = sales_orders.get('discountTotal', 0)
 
+    # Order-level values shared by every line item row; low-cardinality strings are interned
+    reference = sales_orders.get('reference')
+    invoice_number = sales_orders.get('invoiceNumber')
+    customer_order_no = sales_orders.get('customerOrderNo')
+    company = intern_value(sales_orders.get('company'))
+    first_name = sales_orders.get('firstName')
+    last_name = sales_orders.get('lastName')
+    project_name = sales_orders.get('projectName')
+    channel = intern_value(sales_orders.get('source'))
+    currency_code = intern_value(sales_orders.get('currencyCode'))
+
      # Create a dictionary to map full names to abbreviations
     user_abbreviations = {
         "AlbertRogerUK": "ARL",
@@ -115,89 +108,82 @@ def process_sales_orders(sales_orders, user_name):
         adjusted_discount_total = round((discount_total / num_products) * currency_rate, 2)
 
 
-        results.append({
-            'sourceUser': abbreviated_user_name,
-            'reference': sales_orders.get('reference'),
-            'invoiceNumber':sales_orders.get('invoiceNumber'),
-            'customerOrderNo':sales_orders.get('customerOrderNo'),
-            'estimatedDeliveryDate': estimated_delivery_date.strftime('%d/%m/%Y') if invoice_date else '',
-            'company': sales_orders.get('company'),
-            'firstName': sales_orders.get('firstName'),
-            'lastName': sales_orders.get('lastName'),
-            'projectName': sales_orders.get('projectName'),
-            'channel': sales_orders.get('source'),
-            'currencyCode': sales_orders.get('currencyCode'),
-            'lineItemcode':item.get('code',''),
-            'lineItemName': item.get('name', ''),
-            'lineItemQty': item.get('qty', ''),
-            'lineItemoption3': item.get('option3',''),
-            'lineItemUnitPrice': adjusted_unit_price,
-            'lineItemDiscount': adjusted_discount,
-            'discountTotal': adjusted_discount_total,            
-            'invoiceDate': invoice_date.strftime('%d/%m/%Y') if invoice_date else ''
-
-        })
+        results.append((
+            abbreviated_user_name,
+            reference,
+            invoice_number,
+            customer_order_no,
+            estimated_delivery_date,
+            company,
+            first_name,
+            last_name,
+            project_name,
+            channel,
+            currency_code,
+            item.get('code',''),
+            item.get('name', ''),
+            item.get('qty', ''),
+            item.get('option3',''),
+            adjusted_unit_price,
+            adjusted_discount,
+            adjusted_discount_total,
+            invoice_date,
+        ))
     
     return results
 
-def process_user(user):
-    headers = get_auth_header(user['username'], user['key'])
+def process_page(data, user_name, start_date, end_date):
+    page_sales_orders = []
+    for sales_orders in data:
+        try:
+            if is_valid_sales_orders(sales_orders, start_date, end_date):
+                page_sales_orders.extend(process_sales_orders(sales_orders, user_name))
+        except Exception as e:
+            logging.error(f"Error processing sales order: {sales_orders}. Error: {e}")
+    return page_sales_orders
+
+def process_user(user, store=None, sink=None):
+    client = get_client(user['username'], user['key'])
     start_date, end_date = calculate_date_range()
-    all_sales_orders = []
-    page = 1
-
-    while True:
-        url = f'{BASE_URL}?fields={FIELDS}&page={page}&rows={ROWS_PER_PAGE}'
-        logging.info(f"Fetching page {page} for user {user['username']}...")
+    where = date_where(DATE_FIELD, start_date, end_date)
 
-        data, error = call_api(url, headers)
-        if error:
-            logging.error(f"API call failed for user {user['username']}: {error}")
-            break
+    if store:
+        # Rebuild from the local order store instead of paging the API
+        for data in store.iter_pages(ENDPOINT, user['username'], DATE_FIELD, start_date, end_date):
+            sink.write(process_page(data, user['username'], start_date, end_date))
+        return
 
-        if not data:
-            logging.info(f"No more data to fetch for user {user['username']}.")
-            break
+    pages = client.iter_pages(ENDPOINT, {'fields': FIELDS, 'where': where, 'rows': ROWS_PER_PAGE})
+    for page, data in pages:
+        sink.write(process_page(data, user['username'], start_date, end_date))
 
-        for sales_orders in data:
-            try:
-                if is_valid_sales_orders(sales_orders, start_date, end_date):
-                    all_sales_orders.extend(process_sales_orders(sales_orders, user['username']))
-            except Exception as e:
-                logging.error(f"Error processing sales order: {sales_orders}. Error: {e}")
-
-        logging.info(f"Page {page} processed for user {user['username']}.")
-        page += 1
-        time.sleep(0.5)  # Rate limiting
-
-    return all_sales_orders
+def parse_args():
+    return build_parser("Download Cin7 sales orders for a fixed date range to CSV.", store_mode='read').parse_args()
 
 def main():
+    args = parse_args()
+    configure(prefetch=args.prefetch, decoder=args.decoder, cache=args.cache, replay=args.replay,
+              retention=args.cache_retention, checkpoint=args.checkpoint, resume=args.resume,
+              checkpoint_dropbox=args.checkpoint_dropbox, fanout=args.fanout, keyset=args.keyset)
+    store = open_store(args.from_store, args.store_dropbox) if args.from_store else None
     start_date, end_date = calculate_date_range()
     
-    fieldnames = ['sourceUser','reference', 'invoiceNumber','customerOrderNo','estimatedDeliveryDate','company', 'firstName', 'lastName', 'projectName',
-                  'channel', 'currencyCode','lineItemcode', 'lineItemName','lineItemQty','lineItemoption3', 'lineItemUnitPrice', 'lineItemDiscount', 'discountTotal','invoiceDate']
-    
     file_name = f"Sales_Orders_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.csv"
 
      # Saves it in a temporal file 
     output_filename = os.path.join("tmp_files", file_name)
     os.makedirs("tmp_files", exist_ok=True)
 
-    all_sales_orders = []
-
-    # Process users in parallel
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        results = executor.map(process_user, USERS)
-        for user_sales_orders in results:
-            all_sales_orders.extend(user_sales_orders)
-
-    # Write all sales orders to a single CSV file
-    with open(output_filename, mode='w', newline='', encoding='utf-8') as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        writer.writeheader()
-        for sales_orders in all_sales_orders:
-            writer.writerow(sales_orders)
+    # Process users in parallel, streaming each page to the CSV file as it is transformed
+    sink = open_sink(output_filename, COLUMNS, args.output_format, DATE_FIELD)
+    output_filename = sink.path
+    with sink:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda user: process_user(user, store, sink), USERS))
+    close_clients()
+    write_metrics(output_filename)
+    if store:
+        store.close()
 
     logging.info(f"Data successfully written locally at {output_filename}")
 
@@ -0,0 +1,75 @@
+"""Benchmark and regression check: row-wise classify_entity versus the compiled warehouse index.
+
+Builds synthetic Marco_data rows that cover every warehouse rule (all
+listed user+branch codes, the item-code prefix rule, unknown branches,
+missing values and each company override) and checks that the two
+classifiers agree row for row.
+
+    python benchmarks/bench_classify.py [rows]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cin7.warehouse import RULES_FILE, classify_entity, load_index
+
+# Configuration
+ROWS = 1000000
+SEED = 42
+
+COMPANIES = ["ALBERT ROGER UK LTD", "ALBERT ROGER IBERICA", "Albert Roger France", "TESTER ACCOUNT", "CARREFOUR SA",
+             "El Corte Ingles", "Boutique Paris", "Amazon EU", None, ""]
+ITEM_CODES = ["RECF-001", "recf-002", "REC", "NBNA-10", "X100", "", None]
+
+
+def make_rows(rows):
+    """(sourceUser, branchId, company, Item Code) tuples."""
+    with open(RULES_FILE, encoding='utf-8') as f:
+        rules = json.load(f)
+    users = list(rules["user_abbreviations"].values()) + list(rules["user_abbreviations"]) + ["ARN"]
+    known = [code for rule in rules["branch"] + rules["item_prefix"] for code in rule["codes"]]
+
+    rng = random.Random(SEED)
+    generated = []
+    for _ in range(rows):
+        if rng.random() < 0.7:
+            code = rng.choice(known)
+            user = next(abbr for abbr in ("ARNL", "ARIB", "ARL", "ARF", "ARN") if code.startswith(abbr))
+            branch = int(code[len(user):])
+        else:
+            user = rng.choice(users)
+            branch = rng.choice([1, 2, 398, 1234, None, ""])
+        generated.append((user, branch, rng.choice(COMPANIES), rng.choice(ITEM_CODES)))
+    return generated
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    generated = make_rows(rows)
+    records = [{"sourceUser": user, "branchId": branch, "company": company, "Item Code": item_code}
+               for user, branch, company, item_code in generated]
+
+    started = time.perf_counter()
+    row_wise = [classify_entity(record) for record in records]
+    row_wise_time = time.perf_counter() - started
+
+    index = load_index()
+    started = time.perf_counter()
+    indexed = [index.classify(*row) for row in generated]
+    indexed_time = time.perf_counter() - started
+
+    print(f"row-wise {row_wise_time:8.2f}s  {row_wise_time / rows * 1e9:8.0f} ns/row")
+    print(f"indexed  {indexed_time:8.2f}s  {indexed_time / rows * 1e9:8.0f} ns/row")
+    print(f"speed-up x{row_wise_time / indexed_time:.1f}")
+
+    mismatches = sum(expected != actual for expected, actual in zip(row_wise, indexed))
+    if mismatches:
+        sys.exit(f"{mismatches} rows classified differently")
+    print(f"{rows} rows classified identically; {indexed.count(None)} unclassified")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Micro-benchmark: date handling for a synthetic 100k-order page set.
+
+Compares the old per-script path (dateutil for every field, invoiceDate
+parsed twice, strftime for every line item) with ``cin7.dates``.
+
+    python benchmarks/bench_dates.py [orders]
+"""
+import datetime
+import os
+import random
+import sys
+import time
+
+import pytz
+from dateutil import parser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cin7.dates import parse_date, format_date
+
+# Configuration
+ORDERS = 100000
+LINE_ITEMS = 4     # Average line items per order
+DAYS = 90          # Orders are spread over this many days
+SEED = 42
+
+
+def make_orders(count):
+    """Orders shaped like the SalesOrders payload, only the date fields filled in."""
+    rng = random.Random(SEED)
+    start = datetime.datetime(2025, 1, 1, tzinfo=pytz.utc)
+    orders = []
+    for _ in range(count):
+        invoiced = start + datetime.timedelta(days=rng.randrange(DAYS), seconds=rng.randrange(86400))
+        orders.append({
+            'invoiceDate': invoiced.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'createdDate': (invoiced - datetime.timedelta(days=2)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'estimatedDeliveryDate': (invoiced + datetime.timedelta(days=5)).strftime('%Y-%m-%dT00:00:00Z'),
+            'lineItems': [{}] * rng.randint(1, 2 * LINE_ITEMS - 1),
+        })
+    return orders
+
+
+def legacy_parse_date(date_string):
+    if not date_string:
+        return None
+    try:
+        parsed_date = parser.parse(date_string)
+        if parsed_date.tzinfo is None or parsed_date.tzinfo.utcoffset(parsed_date) is None:
+            parsed_date = pytz.utc.localize(parsed_date)
+        else:
+            parsed_date = parsed_date.astimezone(pytz.utc)
+        return parsed_date
+    except ValueError:
+        return None
+
+
+def legacy(orders, start_date, end_date):
+    rows = []
+    for order in orders:
+        if not start_date <= legacy_parse_date(order['invoiceDate']) <= end_date:
+            continue
+        invoice_date = legacy_parse_date(order.get('invoiceDate'))
+        created_date = legacy_parse_date(order.get('createdDate'))
+        estimated_delivery_date = legacy_parse_date(order.get('estimatedDeliveryDate'))
+        for _ in order['lineItems']:
+            rows.append((
+                invoice_date.strftime('%d/%m/%Y') if invoice_date else '',
+                created_date.strftime('%d/%m/%Y') if created_date else '',
+                estimated_delivery_date.strftime('%d/%m/%Y') if estimated_delivery_date else '',
+            ))
+    return rows
+
+
+def cached(orders, start_date, end_date):
+    rows = []
+    for order in orders:
+        if not start_date <= parse_date(order['invoiceDate']) <= end_date:
+            continue
+        dates = (
+            format_date(order.get('invoiceDate')),
+            format_date(order.get('createdDate')),
+            format_date(order.get('estimatedDeliveryDate')),
+        )
+        rows.extend([dates] * len(order['lineItems']))
+    return rows
+
+
+def run(name, func, orders, start_date, end_date):
+    started = time.perf_counter()
+    rows = func(orders, start_date, end_date)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<8} {elapsed:8.3f}s  {len(orders) / elapsed:>12,.0f} orders/s  {len(rows)} rows")
+    return rows, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ORDERS
+    orders = make_orders(count)
+    start_date = datetime.datetime(2025, 1, 15, tzinfo=pytz.utc)
+    end_date = datetime.datetime(2025, 3, 15, 23, 59, 59, tzinfo=pytz.utc)
+
+    parse_date.cache_clear()
+    format_date.cache_clear()
+    legacy_rows, legacy_time = run("legacy", legacy, orders, start_date, end_date)
+    cached_rows, cached_time = run("cached", cached, orders, start_date, end_date)
+
+    if legacy_rows != cached_rows:
+        sys.exit("Output differs between the legacy and cached paths")
+    print(f"speed-up x{legacy_time / cached_time:.1f}; parse_date cache: {parse_date.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
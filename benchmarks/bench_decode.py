@@ -0,0 +1,81 @@
+"""Benchmark: decode + transform of SalesOrders pages with json, orjson and msgspec.
+
+Decodes each page with every available decoder, runs it through
+Daily_SO.process_page, and reports decode and transform time per
+decoder. The rows must come out identical for every decoder.
+
+Pages are read from a directory of recorded response bodies (one JSON
+array per file) when one is given, and generated with
+benchmarks/payloads.py otherwise.
+
+    python benchmarks/bench_decode.py [pages | recorded pages directory]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in ("ARL_KEY", "ARIB_KEY", "ARNL_KEY", "ARF_KEY"):
+    os.environ.setdefault(name, "")  # Daily_SO reads them at import; the mapper never uses them
+from Sales_Orders import Daily_SO
+from cin7.client import page_decoder
+from cin7.dates import parse_date, format_date
+from benchmarks.payloads import make_pages
+
+# Configuration
+PAGES = 200
+ENDPOINT = 'SalesOrders'
+USER = 'AlbertRogerUK'
+
+
+def load_pages(directory):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), 'rb') as f:
+            pages.append(f.read())
+    return pages
+
+
+def run(decode, pages):
+    parse_date.cache_clear()  # Every decoder starts from cold date caches
+    format_date.cache_clear()
+    start_date, end_date = Daily_SO.calculate_date_range()
+    decode_time = transform_time = 0.0
+    rows = []
+    for body in pages:
+        started = time.perf_counter()
+        data = decode(ENDPOINT, body)
+        decoded = time.perf_counter()
+        rows.extend(Daily_SO.process_page(data, USER, start_date, end_date))
+        transform_time += time.perf_counter() - decoded
+        decode_time += decoded - started
+    return decode_time, transform_time, rows
+
+
+def main():
+    argument = sys.argv[1] if len(sys.argv) > 1 else str(PAGES)
+    pages = load_pages(argument) if os.path.isdir(argument) else make_pages(ENDPOINT, int(argument))
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / 2 ** 20:.1f} MiB of JSON")
+
+    baseline = None
+    for name in ('json', 'orjson', 'msgspec'):
+        try:
+            decode = page_decoder(name) or (lambda endpoint, body: json.loads(body))
+        except ImportError as e:
+            print(f"{name:<8} skipped ({e})")
+            continue
+        decode_time, transform_time, rows = run(decode, pages)
+        if baseline is None:
+            baseline = (decode_time + transform_time, rows)
+        elif rows != baseline[1]:
+            sys.exit(f"{name} produced different rows")
+        total = decode_time + transform_time
+        print(f"{name:<8} decode {decode_time:6.2f}s  transform {transform_time:6.2f}s  total {total:6.2f}s  "
+              f"x{baseline[0] / total:.2f}  ({len(rows)} rows)")
+    if Daily_SO.errores_globales:
+        sys.exit(f"{len(Daily_SO.errores_globales)} orders failed to transform")
+
+
+if __name__ == "__main__":
+    main()
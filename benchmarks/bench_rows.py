@@ -0,0 +1,140 @@
+"""Micro-benchmark: dict rows + DictWriter versus tuple rows + csv.writer.
+
+Builds the Daily_SO line-item rows for a synthetic order set both ways and
+reports the memory the rows hold and the time to write them as CSV.
+
+    python benchmarks/bench_rows.py [orders]
+"""
+import csv
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cin7.pipeline import intern_value
+
+# Configuration
+ORDERS = 100000
+LINE_ITEMS = 4     # Average line items per order
+SEED = 42
+
+COLUMNS = ['sourceUser', 'accountingAttributes', 'reference', 'invoiceNumber', 'customerOrderNo', 'createdDate',
+           'estimatedDeliveryDate', 'dispatchedDate', 'company', 'firstName', 'lastName', 'projectName', 'channel',
+           'taxRate', 'currencyCode', 'deliveryCountry', 'branchId', 'lineItemcode', 'lineItemName', 'lineItemQty',
+           'lineItemoption3', 'lineItemUnitPrice', 'lineItemDiscount', 'discountTotal', 'invoiceDate']
+
+COMPANIES = [f"ALBERT ROGER CUSTOMER {n}" for n in range(500)]
+
+
+def make_orders(count):
+    """Orders as json.loads returns them: every string is a separate object."""
+    rng = random.Random(SEED)
+    orders = []
+    for n in range(count):
+        orders.append({
+            'accountingAttributes': {'accountingImportStatus': ''.join(['Imp', 'orted'])},
+            'reference': f"SO-{n}",
+            'invoiceNumber': n,
+            'customerOrderNo': f"PO{n}",
+            'company': ''.join(rng.choice(COMPANIES).split('|')),
+            'firstName': 'Ana', 'lastName': 'Garcia', 'projectName': '',
+            'source': ''.join(['web', 'shop']),
+            'taxRate': 21.0,
+            'currencyCode': ''.join(['E', 'UR']),
+            'deliveryCountry': ''.join(['Spa', 'in']),
+            'branchId': 3,
+            'lineItems': [{'code': f"NB{i}", 'name': f"Item {i}", 'qty': 2, 'option3': 'M', 'createdDate': ''}
+                          for i in range(rng.randint(1, 2 * LINE_ITEMS - 1))],
+        })
+    return orders
+
+
+def dict_rows(order):
+    return [{
+        'sourceUser': 'ARL',
+        'accountingAttributes': order.get('accountingAttributes').get('accountingImportStatus'),
+        'reference': order.get('reference'),
+        'invoiceNumber': order.get('invoiceNumber'),
+        'customerOrderNo': order.get('customerOrderNo'),
+        'createdDate': item.get('createdDate', ''),
+        'estimatedDeliveryDate': '01/02/2025',
+        'dispatchedDate': '01/02/2025',
+        'company': order.get('company'),
+        'firstName': order.get('firstName'),
+        'lastName': order.get('lastName'),
+        'projectName': order.get('projectName'),
+        'channel': order.get('source'),
+        'taxRate': order.get('taxRate'),
+        'currencyCode': order.get('currencyCode'),
+        'deliveryCountry': order.get('deliveryCountry'),
+        'branchId': order.get('branchId'),
+        'lineItemcode': item.get('code', ''),
+        'lineItemName': item.get('name', ''),
+        'lineItemQty': item.get('qty', ''),
+        'lineItemoption3': item.get('option3', ''),
+        'lineItemUnitPrice': 3.85,
+        'lineItemDiscount': 0.55,
+        'discountTotal': 0.73,
+        'invoiceDate': '28/01/2025',
+    } for item in order['lineItems']]
+
+
+def tuple_rows(order):
+    accounting_status = intern_value(order.get('accountingAttributes').get('accountingImportStatus'))
+    company = intern_value(order.get('company'))
+    channel = intern_value(order.get('source'))
+    currency_code = intern_value(order.get('currencyCode'))
+    delivery_country = intern_value(order.get('deliveryCountry'))
+    return [(
+        'ARL', accounting_status, order.get('reference'), order.get('invoiceNumber'), order.get('customerOrderNo'),
+        item.get('createdDate', ''), '01/02/2025', '01/02/2025', company, order.get('firstName'),
+        order.get('lastName'), order.get('projectName'), channel, order.get('taxRate'), currency_code,
+        delivery_country, order.get('branchId'), item.get('code', ''), item.get('name', ''), item.get('qty', ''),
+        item.get('option3', ''), 3.85, 0.55, 0.73, '28/01/2025',
+    ) for item in order['lineItems']]
+
+
+def write_dicts(rows, out):
+    writer = csv.DictWriter(out, fieldnames=COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+
+def write_tuples(rows, out):
+    writer = csv.writer(out)
+    writer.writerow(COLUMNS)
+    writer.writerows(rows)
+
+
+def run(name, build, write, orders):
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = [row for order in orders for row in build(order)]
+    built = time.perf_counter()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    out = io.StringIO()
+    started_write = time.perf_counter()
+    write(rows, out)
+    written = time.perf_counter()
+    print(f"{name:<7} build {built - started:6.2f}s  write {written - started_write:6.2f}s  "
+          f"rows hold {held / 2 ** 20:7.1f} MiB  ({len(rows)} rows)")
+    return out.getvalue()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ORDERS
+    orders = make_orders(count)
+    dict_csv = run("dicts", dict_rows, write_dicts, orders)
+    tuple_csv = run("tuples", tuple_rows, write_tuples, orders)
+    if dict_csv != tuple_csv:
+        sys.exit("CSV output differs between dict and tuple rows")
+
+
+if __name__ == "__main__":
+    main()
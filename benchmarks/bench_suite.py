@@ -0,0 +1,231 @@
+"""Benchmark suite for the transform hot path.
+
+Generates a synthetic payload (benchmarks/payloads.py) and times each
+stage of the pipeline on it:
+
+    parse_date, format_date           Cin7 timestamps (cold caches)
+    process_sales_orders              Sales_Orders/Daily_SO.py
+    process_credit_note               Credit_Notes/Daily_CRN.py
+    process_purchase_order            Purchases/Daily_Purchases.py
+    classify, classify_entity         warehouse index vs the original row-wise rules
+    csv_writer, parquet_writer        cin7.pipeline / cin7.parquet_writer on the sales order rows
+
+Each stage reports its best time over at least ``--repeat`` runs (and
+``MIN_SECONDS`` of timing) as items/s, plus rows/s for the mappers.
+A separate run under tracemalloc reports
+the peak memory and the number of allocated blocks still alive after
+the stage. Results are written as JSON; ``--compare`` checks them
+against an earlier results file and exits non-zero when a stage got
+slower by more than ``--threshold``. Compare runs made on the same,
+otherwise idle machine; on shared hosts raise ``--threshold``.
+
+    python benchmarks/bench_suite.py [--orders N] [--line-items M] [--output FILE] [--compare FILE]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name in ("ARL_KEY", "ARIB_KEY", "ARNL_KEY", "ARF_KEY"):
+    os.environ.setdefault(name, "")  # The scripts read them at import; the mappers never use them
+from Sales_Orders import Daily_SO
+from Credit_Notes import Daily_CRN
+from Purchases import Daily_Purchases
+from cin7.dates import parse_date, format_date
+from cin7.pipeline import RowWriter
+from cin7.warehouse import classify_entity, load_index
+from benchmarks.payloads import make_orders
+
+# Configuration
+ORDERS = 20000
+LINE_ITEMS = 4
+REPEAT = 3
+MIN_SECONDS = 1.0  # Short stages keep repeating until they have been timed for this long
+THRESHOLD = 0.20  # Slowdown that --compare reports as a regression
+USER = 'AlbertRogerUK'
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_results.json')  # Ignored by git
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def clear_caches():
+    parse_date.cache_clear()
+    format_date.cache_clear()
+
+
+def map_orders(mapper, orders):
+    rows = []
+    for order in orders:
+        rows.extend(mapper(order, USER))
+    return rows
+
+
+def write_csv(rows):
+    with tempfile.TemporaryDirectory() as directory:
+        writer = RowWriter(os.path.join(directory, 'rows.csv'), Daily_SO.COLUMNS)
+        writer.open()
+        writer.write_rows(rows)
+        writer.close()
+
+
+def write_parquet(rows):
+    from cin7.parquet_writer import ParquetRowWriter
+    with tempfile.TemporaryDirectory() as directory:
+        writer = ParquetRowWriter(os.path.join(directory, 'rows'), Daily_SO.COLUMNS, Daily_SO.DATE_FIELD)
+        writer.open()
+        writer.write_rows(rows)
+        writer.close()
+
+
+def build_stages(orders_count, line_items):
+    """``{stage: (function, argument, items, unit, rows)}``; ``rows`` is None when the stage makes none."""
+    sales_orders = make_orders('SalesOrders', orders_count, line_items)
+    credit_notes = make_orders('CreditNotes', orders_count, line_items)
+    purchase_orders = make_orders('PurchaseOrders', orders_count, line_items)
+
+    dates = [order[field] for order in sales_orders
+             for field in ('invoiceDate', 'createdDate', 'dispatchedDate', 'estimatedDeliveryDate')]
+    so_rows = map_orders(Daily_SO.process_sales_orders, sales_orders)
+    classify_rows = [(row[0], row[16], row[8], row[17]) for row in so_rows]
+    classify_records = [{"sourceUser": user, "branchId": branch, "company": company, "Item Code": item}
+                        for user, branch, company, item in classify_rows]
+    index = load_index()
+
+    stages = {
+        'parse_date': (lambda values: [parse_date(value) for value in values], dates, len(dates), 'dates', None),
+        'format_date': (lambda values: [format_date(value) for value in values], dates, len(dates), 'dates', None),
+        'process_sales_orders': (lambda orders: map_orders(Daily_SO.process_sales_orders, orders), sales_orders,
+                                 len(sales_orders), 'orders', len(so_rows)),
+        'process_credit_note': (lambda orders: map_orders(Daily_CRN.process_credit_note, orders), credit_notes,
+                                len(credit_notes), 'orders', None),
+        'process_purchase_order': (lambda orders: map_orders(Daily_Purchases.process_purchase_order, orders),
+                                   purchase_orders, len(purchase_orders), 'orders', None),
+        'classify': (lambda rows: [index.classify(*row) for row in rows], classify_rows, len(classify_rows),
+                     'rows', None),
+        'classify_entity': (lambda records: [classify_entity(record) for record in records], classify_records,
+                            len(classify_records), 'rows', None),
+        'csv_writer': (write_csv, so_rows, len(so_rows), 'rows', None),
+    }
+    try:
+        import pyarrow  # noqa: F401
+        stages['parquet_writer'] = (write_parquet, so_rows, len(so_rows), 'rows', None)
+    except ImportError:
+        pass
+    return stages
+
+
+def measure(function, argument, repeat):
+    best = None
+    runs = total = 0
+    while runs < repeat or total < MIN_SECONDS:
+        clear_caches()
+        gc.collect()
+        gc.disable()  # As timeit does: collections triggered by earlier stages' garbage are noise
+        started = time.perf_counter()
+        result = function(argument)
+        elapsed = time.perf_counter() - started
+        gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+        runs += 1
+        total += elapsed
+        del result
+
+    clear_caches()
+    gc.collect()
+    tracemalloc.start()
+    result = function(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del result
+    return best, peak, blocks
+
+
+def run_suite(orders_count, line_items, repeat):
+    stages = build_stages(orders_count, line_items)
+    results = {}
+    for name, (function, argument, items, unit, rows) in stages.items():
+        seconds, peak, blocks = measure(function, argument, repeat)
+        result = {
+            'seconds': round(seconds, 4),
+            'items': items,
+            'unit': unit,
+            'items_per_s': round(items / seconds),
+            'peak_kib': round(peak / 1024),
+            'allocated_blocks': blocks,
+        }
+        line = f"{name:<24} {seconds:8.3f}s  {items / seconds:>12,.0f} {unit}/s"
+        if name.startswith('process_'):
+            rows = rows or len(function(argument))
+            result['rows_per_s'] = round(rows / seconds)
+            line += f"  {rows / seconds:>12,.0f} rows/s"
+        print(f"{line}  peak {peak / 2 ** 20:7.1f} MiB  {blocks:>9,} blocks")
+        results[name] = result
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Print each stage's speed against ``baseline_path``; returns the stages that slowed past ``threshold``."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"\nAgainst {baseline_path} (commit {baseline.get('commit')}):")
+    for name, result in results.items():
+        before = baseline['stages'].get(name)
+        if not before:
+            continue
+        change = before['items_per_s'] / result['items_per_s'] - 1  # > 0 means slower now
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:<24} {before['items_per_s']:>12,} -> {result['items_per_s']:>12,} "
+              f"{result['unit']}/s  ({-change:+.1%}){flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the transform hot path.")
+    arg_parser.add_argument('--orders', type=int, default=ORDERS, help=f"Orders per entity (default {ORDERS}).")
+    arg_parser.add_argument('--line-items', type=int, default=LINE_ITEMS,
+                            help=f"Average line items per order (default {LINE_ITEMS}).")
+    arg_parser.add_argument('--repeat', type=int, default=REPEAT, help=f"Timed runs per stage (default {REPEAT}).")
+    arg_parser.add_argument('--output', default=RESULTS_FILE, help="Results file (default benchmarks/bench_results.json).")
+    arg_parser.add_argument('--compare', metavar='FILE', help="Earlier results file to check for regressions.")
+    arg_parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                            help=f"Slowdown reported as a regression (default {THRESHOLD:.0%}).")
+    args = arg_parser.parse_args()
+
+    results = run_suite(args.orders, args.line_items, args.repeat)
+    report = {
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'orders': args.orders,
+        'line_items': args.line_items,
+        'stages': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            sys.exit(f"Slower than {args.compare}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Synthetic Cin7 payloads for the benchmarks.
+
+Orders carry the order-level fields the extractors request for their
+endpoint and line items carry the full set of fields Cin7 returns for
+them (the ``fields`` parameter only trims order-level fields). Dates are
+spread over 2024-2025 in Cin7's ``YYYY-MM-DDTHH:MM:SSZ`` format and
+orders come in a handful of currencies with their exchange rates.
+"""
+import datetime
+import json
+import random
+
+# Configuration
+SEED = 42
+ROWS_PER_PAGE = 250
+START = datetime.datetime(2024, 1, 1)
+DAYS = 730
+CURRENCIES = [('GBP', 1.0), ('EUR', 1.17), ('USD', 1.27), ('CHF', 1.12)]
+COUNTRIES = ['United Kingdom', 'Spain', 'France', 'Netherlands', 'Germany', 'Italy']
+CHANNELS = ['Web', 'Wholesale', 'Amazon', 'Retail']
+BRANCHES = [3, 4, 726, 777, 916, 969, 180, 179, 130]
+COMPANIES = [f"Customer {n}" for n in range(500)] + ["ALBERT ROGER UK LTD", "TESTER ACCOUNT", "CARREFOUR SA"]
+
+
+def stamp(rng):
+    moment = START + datetime.timedelta(seconds=rng.randint(0, DAYS * 86400))
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def make_line_item(rng, sort, created):
+    return {
+        'id': rng.randint(1, 10 ** 7), 'createdDate': created, 'transaction': rng.randint(1, 10 ** 6),
+        'parentId': 0, 'productId': rng.randint(1, 10 ** 5), 'productOptionId': rng.randint(1, 10 ** 5),
+        'integrationRef': '', 'sort': sort, 'code': f"NB{rng.randint(1000, 9999)}", 'name': f"Product {sort}",
+        'option1': 'Black', 'option2': '', 'option3': rng.choice(['S', 'M', 'L']), 'qty': rng.randint(1, 12),
+        'styleCode': f"ST{sort}", 'barcode': str(rng.randint(10 ** 12, 10 ** 13)), 'sizeCodes': '',
+        'lineComments': '', 'unitCost': round(rng.uniform(1, 20), 2), 'unitPrice': round(rng.uniform(2, 40), 2),
+        'uomPrice': 0.0, 'discount': round(rng.uniform(0, 3), 2), 'uomQtyOrdered': 0.0, 'uomQtyShipped': 0.0,
+        'uomSize': 0.0, 'qtyShipped': 0, 'holdingQty': 0, 'accountCode': '4000', 'stockControl': 'FIFO',
+        'stockMovements': [], 'sizes': [],
+    }
+
+
+def make_order(rng, endpoint, number, line_items):
+    created = stamp(rng)
+    currency_code, currency_rate = rng.choice(CURRENCIES)
+    order = {
+        'id': number, 'createdDate': created, 'modifiedDate': stamp(rng), 'company': rng.choice(COMPANIES),
+        'firstName': 'Ana', 'lastName': 'Garcia', 'projectName': '', 'source': rng.choice(CHANNELS),
+        'currencyCode': currency_code, 'currencyRate': currency_rate, 'branchId': rng.choice(BRANCHES),
+        'lineItems': [make_line_item(rng, sort, created) for sort in range(rng.randint(1, 2 * line_items - 1))],
+    }
+    if endpoint == 'SalesOrders':
+        order.update({
+            'reference': f"SO-{number}", 'customerOrderNo': f"PO{number}", 'salesReference': '',
+            'invoiceNumber': 100000 + number, 'invoiceDate': stamp(rng), 'estimatedDeliveryDate': stamp(rng),
+            'dispatchedDate': stamp(rng), 'completedDate': stamp(rng), 'deliveryCountry': rng.choice(COUNTRIES),
+            'discountTotal': rng.choice([0, 0, 4.5, 12.0]), 'taxRate': rng.choice([0, 20, 21]),
+            'accountingAttributes': {'accountingImportStatus': rng.choice(['Imported', 'Not Imported'])},
+            'customFields': {'orders_1001': rng.choice(['Wholesale', 'Retail', None])},
+        })
+    elif endpoint == 'CreditNotes':
+        order.update({
+            'reference': f"CR-{number}", 'creditNoteNumber': f"CN{number}", 'salesReference': f"SO-{number}",
+            'invoiceNumber': 100000 + number, 'completedDate': stamp(rng),
+            'discountTotal': rng.choice([0, 0, 4.5]),
+            'accountingAttributes': {'accountingImportStatus': rng.choice(['Imported', 'Not Imported'])},
+        })
+    else:
+        order.update({
+            'reference': f"PO-{number}", 'invoiceNumber': 100000 + number, 'estimatedDeliveryDate': stamp(rng),
+            'fullyReceivedDate': stamp(rng), 'status': rng.choice(['APPROVED', 'DRAFT']),
+            'stage': rng.choice(['Received', 'Ordered']), 'Stage': 'Received', 'internalComments': '',
+            'isVoid': rng.random() < 0.02,
+        })
+    return order
+
+
+def make_orders(endpoint, count, line_items=4, seed=SEED):
+    """``count`` orders of ``endpoint`` with ``line_items`` line items each on average."""
+    rng = random.Random(seed)
+    return [make_order(rng, endpoint, number, line_items) for number in range(count)]
+
+
+def make_pages(endpoint, count, line_items=4, seed=SEED, rows=ROWS_PER_PAGE):
+    """``count`` pages of ``endpoint`` as raw response bodies."""
+    orders = make_orders(endpoint, count * rows, line_items, seed)
+    return [json.dumps(orders[start:start + rows]).encode('utf-8') for start in range(0, len(orders), rows)]
@@ -0,0 +1 @@
+"""Shared helpers for the Cin7 extractor scripts."""
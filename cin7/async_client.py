@@ -0,0 +1,221 @@
+import asyncio
+import base64
+import collections
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from cin7 import metrics
+from cin7.client import API_ROOT, PageStream
+from cin7.scheduler import get_scheduler, LANE_DAILY
+from cin7.rate_limiter import get_limiter
+from cin7.retry import (
+    CONNECT_TIMEOUT, READ_TIMEOUT, MAX_RETRIES, RETRY_STATUSES,
+    backoff_delay, retry_after_seconds,
+)
+
+# Configuration
+PREFETCH_WINDOW = 4  # Page requests kept in flight per tenant
+
+RETRY_EXCEPTIONS = (httpx.TransportError, httpx.DecodingError)
+
+LOCK = threading.Lock()  # Guards creation of the shared event loop
+
+loop = None
+
+DONE = object()  # Marks the end of a page stream
+
+
+def get_loop():
+    """Event loop shared by every tenant, running in a daemon thread."""
+    global loop
+    with LOCK:
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="cin7-async", daemon=True).start()
+        return loop
+
+
+class AsyncCin7Client:
+    """httpx-based Cin7 client; same retry and rate-limit rules as :class:`cin7.client.Cin7Client`.
+
+    Every request queues in the tenant's :class:`~cin7.scheduler.FairScheduler`
+    like the sequential client's, so lanes and weights hold with prefetching
+    too. The scheduler blocks, so it is waited on in a worker thread
+    (``executor``, or the loop's default one) and the event loop keeps
+    serving the requests already in flight.
+    """
+
+    def __init__(self, username, key, api_root=API_ROOT, window=PREFETCH_WINDOW, decode=None):
+        self.username = username
+        self.limiter = get_limiter(username)
+        self.scheduler = get_scheduler(username)
+        self.decode = decode
+
+        credentials = f"{username}:{key}"
+        encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
+        self.http = httpx.AsyncClient(
+            base_url=api_root,
+            headers={
+                'Authorization': f'Basic {encoded_credentials}',
+                'Content-Type': 'application/json',
+                'Accept': 'application/json',
+                'Accept-Encoding': 'gzip, deflate',
+            },
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=window, max_keepalive_connections=window),
+        )
+
+    async def get(self, endpoint, params=None, lane=LANE_DAILY, weight=1.0):
+        """GET ``endpoint`` and return ``(data, error)``, retrying transient failures."""
+        data, _, error = await self.fetch(endpoint, params, lane, weight)
+        return data, error
+
+    async def fetch(self, endpoint, params=None, lane=LANE_DAILY, weight=1.0, executor=None):
+        """Like :meth:`get`, but returns ``(data, raw body, error)``."""
+        error = None
+        loop = asyncio.get_running_loop()
+        for attempt in range(MAX_RETRIES + 1):
+            waited = await loop.run_in_executor(executor, self.scheduler.acquire, endpoint, lane, weight)
+            started = time.perf_counter()
+            try:
+                response = await self.http.get(f"/{endpoint}", params=params)
+                received = time.perf_counter()
+                failed = response.status_code in RETRY_STATUSES or response.status_code >= 400
+                metrics.record_request(self.username, endpoint, received - started, len(response.content),
+                                       waited, failed)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    data = response.json() if self.decode is None else self.decode(endpoint, response.content)
+                    metrics.record_stage(self.username, endpoint, 'decode', time.perf_counter() - received)
+                    self.limiter.relax()
+                    return data, response.content, None
+
+                error = f"{response.status_code} {response.reason_phrase} for url: {response.url}"
+                delay = retry_after_seconds(response)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                if response.status_code == 429:
+                    self.limiter.throttle(delay)
+            except RETRY_EXCEPTIONS as e:
+                metrics.record_request(self.username, endpoint, time.perf_counter() - started, 0, waited,
+                                       failed=True)
+                error = str(e) or type(e).__name__
+                delay = backoff_delay(attempt)
+            except (httpx.HTTPError, ValueError) as e:
+                return None, None, str(e)
+
+            if attempt < MAX_RETRIES:
+                logging.warning(f"{endpoint} request for {self.username} failed ({error}); "
+                                f"retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                metrics.record_retry_wait(self.username, endpoint, delay)
+
+        return None, None, error
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+class PrefetchPageStream(PageStream):
+    """:class:`PageStream` that keeps ``window`` page requests in flight.
+
+    Pages are fetched on the shared event loop and handed over in order
+    through a queue of ``window`` pages, so the caller transforms page N
+    while pages N+1.. are downloading. Requests still go through the
+    tenant's scheduler, each waiting for its turn on one of the stream's
+    ``window`` threads. At most ``window - 1`` requests are wasted past
+    the last page; they are cancelled as soon as an empty page arrives.
+    """
+
+    def __init__(self, client, endpoint, params, window, lane=LANE_DAILY, weight=1.0, stop_before=None):
+        super().__init__(client, endpoint, params, lane, weight, stop_before)
+        self.window = window
+
+    async def produce(self, pages, stop, next_page):
+        username = self.client.username
+        async_client = self.client.async_client
+        in_flight = collections.deque()
+        # One thread per request in flight, so each one can queue in the scheduler at once
+        executor = ThreadPoolExecutor(max_workers=self.window, thread_name_prefix=f"cin7-{username}")
+
+        def schedule():
+            nonlocal next_page
+            logging.info(f"Fetching page {next_page} for user {username}...")
+            request = async_client.fetch(self.endpoint, dict(self.params, page=next_page), self.lane, self.weight,
+                                         executor)
+            in_flight.append((next_page, asyncio.ensure_future(request)))
+            next_page += 1
+
+        try:
+            for _ in range(self.window):
+                schedule()
+
+            while in_flight and not stop.is_set():
+                page, request = in_flight.popleft()
+                data, body, error = await request
+                if error:
+                    logging.error(f"API call failed for user {username}: {error}")
+                    self.error = error
+                    break
+
+                if not data:
+                    logging.info(f"No more data to fetch for user {username}.")
+                    self.completed = True
+                    break
+
+                schedule()
+                await asyncio.to_thread(pages.put, (page, data, body))
+        finally:
+            for _, request in in_flight:
+                request.cancel()
+            executor.shutdown(wait=False)
+            await asyncio.to_thread(pages.put, DONE)
+
+    def fetched(self, page):
+        pages = queue.Queue(maxsize=self.window)
+        stop = threading.Event()
+        future = asyncio.run_coroutine_threadsafe(self.produce(pages, stop, page), self.client.loop)
+        try:
+            while True:
+                item = pages.get()
+                if item is DONE:
+                    break
+                yield item
+        finally:
+            # Unblock the producer if the caller stopped early, then surface its errors
+            stop.set()
+            while not future.done():
+                try:
+                    pages.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            future.result()
+
+
+class PrefetchClient:
+    """Synchronous front-end over :class:`AsyncCin7Client` for the thread-per-tenant scripts."""
+
+    def __init__(self, username, key, window=PREFETCH_WINDOW, decode=None, cache=None, checkpoints=None):
+        self.username = username
+        self.window = window
+        self.cache = cache
+        self.checkpoints = checkpoints
+        self.decode = decode
+        self.loop = get_loop()
+        self.async_client = AsyncCin7Client(username, key, window=window, decode=decode)
+        self.limiter = self.async_client.limiter
+
+    def get(self, endpoint, params=None, lane=LANE_DAILY, weight=1.0):
+        return asyncio.run_coroutine_threadsafe(self.async_client.get(endpoint, params, lane, weight),
+                                                self.loop).result()
+
+    def iter_pages(self, endpoint, params, lane=LANE_DAILY, weight=1.0, stop_before=None):
+        return PrefetchPageStream(self, endpoint, params, self.window, lane, weight, stop_before)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.async_client.aclose(), self.loop).result()
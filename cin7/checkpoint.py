@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from cin7 import dropbox
+from cin7.client import query_key
+
+# Configuration
+CHECKPOINT_FILE = os.path.join("state", "checkpoints.sqlite")
+COMPRESSION_LEVEL = 1  # zlib level for the stored page bodies; fast, and JSON still shrinks ~10x
+
+
+class CheckpointStore:
+    """Progress of every paged query of a run, kept in one SQLite file.
+
+    Each page is stored as its raw, compressed response body in the same
+    transaction that moves the query's position forward, so a run killed
+    at any point leaves a checkpoint that ends on a whole page. A resumed
+    run replays the stored pages through the extractor (no API calls) to
+    rebuild the partial output, then carries on paging from where the
+    checkpoint stopped. The output is therefore always rebuilt whole, in
+    whatever ``--output-format`` the resumed run asks for.
+
+    Without ``resume`` every query starts from page 1 and its previous
+    checkpoint is discarded. Once every query of a run has completed,
+    :meth:`finish` drops their checkpoints.
+    """
+
+    def __init__(self, path=CHECKPOINT_FILE, resume=False):
+        self.path = path
+        self.resume = resume
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()  # Tenant threads share one connection
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.opened = []
+        self.finished = False
+        with self.lock, self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS queries (tenant TEXT NOT NULL, endpoint TEXT NOT NULL, '
+                'query_key TEXT NOT NULL, query TEXT NOT NULL, pages INTEGER NOT NULL, completed INTEGER NOT NULL, '
+                'updated TEXT NOT NULL, PRIMARY KEY (tenant, endpoint, query_key))'
+            )
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS pages (tenant TEXT NOT NULL, endpoint TEXT NOT NULL, '
+                'query_key TEXT NOT NULL, page INTEGER NOT NULL, body BLOB NOT NULL, '
+                'PRIMARY KEY (tenant, endpoint, query_key, page))'
+            )
+
+    def open(self, tenant, endpoint, params):
+        """Checkpoint for one query; continues the stored one when resuming, else starts afresh."""
+        checkpoint = QueryCheckpoint(self, tenant, endpoint, params)
+        if self.resume and checkpoint.pages:
+            state = "complete" if checkpoint.completed else f"stopped after page {checkpoint.pages}"
+            logging.info(f"Resuming {endpoint} for user {tenant}: checkpoint {state}")
+        else:
+            checkpoint.reset()
+        with self.lock:
+            self.opened.append(checkpoint)
+        return checkpoint
+
+    def finish(self, clear=True):
+        """Close the store; with ``clear``, drop the checkpoints of a run whose queries all completed."""
+        if self.finished:
+            return
+        self.finished = True
+        incomplete = [checkpoint for checkpoint in self.opened if not checkpoint.completed]
+        if incomplete or not clear:
+            for checkpoint in incomplete:
+                logging.warning(f"{checkpoint.endpoint} for user {checkpoint.tenant} stopped after page "
+                                f"{checkpoint.pages}; checkpoint kept in {self.path}, rerun with --resume")
+        else:
+            for checkpoint in self.opened:
+                checkpoint.reset(keep_query=False)
+            with self.lock:
+                self.conn.execute('VACUUM')
+            if self.opened:
+                logging.info(f"Every query completed; checkpoints cleared from {self.path}")
+        with self.lock:
+            self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self.conn.close()
+
+
+class QueryCheckpoint:
+    """Stored pages and position of one tenant's query; see :class:`CheckpointStore`."""
+
+    def __init__(self, store, tenant, endpoint, params):
+        self.store = store
+        self.tenant = tenant
+        self.endpoint = endpoint
+        self.query = {name: value for name, value in params.items() if name != 'page'}
+        self.key = (tenant, endpoint, query_key(params))
+        with store.lock:
+            row = store.conn.execute('SELECT pages, completed FROM queries WHERE tenant = ? AND endpoint = ? '
+                                     'AND query_key = ?', self.key).fetchone()
+        self.pages, self.completed = (row[0], bool(row[1])) if row else (0, False)
+
+    def reset(self, keep_query=True):
+        conn = self.store.conn
+        with self.store.lock, conn:
+            conn.execute('DELETE FROM pages WHERE tenant = ? AND endpoint = ? AND query_key = ?', self.key)
+            conn.execute('DELETE FROM queries WHERE tenant = ? AND endpoint = ? AND query_key = ?', self.key)
+            if keep_query:
+                conn.execute('INSERT INTO queries VALUES (?, ?, ?, ?, 0, 0, ?)',
+                             self.key + (json.dumps(self.query, sort_keys=True), self.updated()))
+        self.pages, self.completed = 0, False
+
+    def bodies(self):
+        """Yield ``(page, raw body)`` for every stored page, in order."""
+        for page in range(1, self.pages + 1):
+            with self.store.lock:
+                row = self.store.conn.execute('SELECT body FROM pages WHERE tenant = ? AND endpoint = ? '
+                                              'AND query_key = ? AND page = ?', self.key + (page,)).fetchone()
+            yield page, zlib.decompress(row[0])
+
+    def save(self, page, body):
+        """Store ``page`` and make it the last completed one, in one transaction."""
+        compressed = zlib.compress(body, COMPRESSION_LEVEL)
+        conn = self.store.conn
+        with self.store.lock, conn:
+            conn.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)', self.key + (page, compressed))
+            conn.execute('UPDATE queries SET pages = ?, updated = ? WHERE tenant = ? AND endpoint = ? '
+                         'AND query_key = ?', (page, self.updated()) + self.key)
+        self.pages = page
+
+    def complete(self):
+        conn = self.store.conn
+        with self.store.lock, conn:
+            conn.execute('UPDATE queries SET completed = 1, updated = ? WHERE tenant = ? AND endpoint = ? '
+                         'AND query_key = ?', (self.updated(),) + self.key)
+        self.completed = True
+
+    @staticmethod
+    def updated():
+        return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def open_checkpoints(path, resume=False, dropbox_path=None):
+    """Open the checkpoint store at ``path``, first refreshing it from Dropbox if ``dropbox_path`` is set."""
+    if dropbox_path:
+        if dropbox.download_file(dropbox_path, path):
+            logging.info(f"Downloaded checkpoints from Dropbox: {dropbox_path}")
+        else:
+            logging.info(f"No checkpoints in Dropbox at {dropbox_path}; starting from scratch.")
+    return CheckpointStore(path, resume)
+
+
+def save_checkpoints(checkpoints, dropbox_path=None, clear=True):
+    """Finish the checkpoint store and, if ``dropbox_path`` is set, upload it for the next session."""
+    checkpoints.finish(clear)
+    if dropbox_path:
+        dropbox.upload_file(checkpoints.path, dropbox_path)
+        logging.info(f"Uploaded checkpoints to Dropbox: {dropbox_path}")
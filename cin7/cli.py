@@ -0,0 +1,75 @@
+import argparse
+
+from cin7.store import STORE_FILE
+from cin7.checkpoint import CHECKPOINT_FILE
+
+PREFETCH_WINDOW = 4
+FANOUT_WORKERS = 4
+GRACE_HOURS = 24  # Default --newest-first margin below the window's start
+CACHE_DIR = 'page_cache'
+CACHE_RETENTION_DAYS = 30
+OUTPUT_FORMATS = ('csv', 'parquet')
+DECODERS = ('json', 'orjson', 'msgspec')
+
+
+def build_parser(description, store_mode=None, output_formats=OUTPUT_FORMATS, newest_first=False):
+    """Common command line for the extractor scripts.
+
+    ``store_mode`` is ``'write'`` for scripts that mirror every fetched page
+    into the local order store, and ``'read'`` for scripts that can rebuild
+    their output from that store instead of calling the API.
+    ``output_formats`` lists the ``--output-format`` choices, default first.
+    ``newest_first`` adds ``--newest-first`` for scripts that read a short, recent window.
+    """
+    arg_parser = argparse.ArgumentParser(description=description)
+    arg_parser.add_argument('--output-format', choices=output_formats, default=output_formats[0],
+                            help=f"Output file format (default {output_formats[0]}). 'parquet' writes typed files "
+                                 f"partitioned by tenant and month into a directory (requires pyarrow).")
+    arg_parser.add_argument('--prefetch', type=int, nargs='?', const=PREFETCH_WINDOW, default=0, metavar='PAGES',
+                            help=f"Fetch with the asyncio engine, keeping this many page requests in flight "
+                                 f"per tenant (default {PREFETCH_WINDOW}; requires httpx).")
+    arg_parser.add_argument('--fanout', type=int, nargs='?', const=FANOUT_WORKERS, default=0, metavar='WORKERS',
+                            help=f"Probe each query's page count with cheap id-only requests, then fetch its pages "
+                                 f"with this many threads per tenant (default {FANOUT_WORKERS}; "
+                                 f"ignored with --prefetch).")
+    arg_parser.add_argument('--keyset', action='store_true',
+                            help="Page by id (id > last id seen, ordered by id) instead of by page number: deep "
+                                 "pages cost the same as the first and every order is returned once "
+                                 "(overrides --prefetch and --fanout).")
+    arg_parser.add_argument('--decoder', choices=DECODERS, default=DECODERS[0],
+                            help="How API pages are decoded: 'json' (default), 'orjson' (same dicts, faster), or "
+                                 "'msgspec' (typed records holding only the fields the extractors use).")
+    arg_parser.add_argument('--cache', nargs='?', const=CACHE_DIR, metavar='DIR',
+                            help=f"Record every complete crawl as raw zstd-compressed pages in this directory "
+                                 f"(default {CACHE_DIR}; requires zstandard).")
+    arg_parser.add_argument('--replay', nargs='?', const=CACHE_DIR, metavar='DIR',
+                            help=f"Rebuild the output from the pages recorded with --cache (default {CACHE_DIR}) "
+                                 f"without calling the API.")
+    arg_parser.add_argument('--cache-retention', type=float, default=CACHE_RETENTION_DAYS, metavar='DAYS',
+                            help=f"Delete cached queries older than this many days (default {CACHE_RETENTION_DAYS}).")
+    arg_parser.add_argument('--checkpoint', nargs='?', const=CHECKPOINT_FILE, metavar='FILE',
+                            help=f"Checkpoint every page of each tenant's query to this SQLite file "
+                                 f"(default {CHECKPOINT_FILE}) so an interrupted run can be resumed.")
+    arg_parser.add_argument('--resume', action='store_true',
+                            help="Continue each query from its checkpoint: checkpointed pages are rebuilt "
+                                 "without API calls and paging carries on after them.")
+    arg_parser.add_argument('--checkpoint-dropbox',
+                            help="Dropbox path the checkpoint file is downloaded from and uploaded back to, "
+                                 "so a backfill can continue in the next runner session.")
+
+    if newest_first:
+        arg_parser.add_argument('--newest-first', type=float, nargs='?', const=GRACE_HOURS, metavar='GRACE_HOURS',
+                                help=f"Page newest-first on the date field, from the window's start less this "
+                                     f"margin (default {GRACE_HOURS}), and stop at the last page.")
+
+    if store_mode == 'write':
+        arg_parser.add_argument('--store', nargs='?', const=STORE_FILE,
+                                help=f"Upsert every fetched order into this SQLite store (default {STORE_FILE}).")
+    elif store_mode == 'read':
+        arg_parser.add_argument('--from-store', nargs='?', const=STORE_FILE,
+                                help=f"Build the output from this SQLite store instead of the API (default {STORE_FILE}).")
+
+    if store_mode:
+        arg_parser.add_argument('--store-dropbox',
+                                help="Dropbox path the SQLite store is downloaded from (and uploaded back to when writing).")
+    return arg_parser
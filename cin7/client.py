@@ -0,0 +1,467 @@
+import atexit
+import base64
+import collections
+import datetime
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cin7 import metrics
+from cin7.dates import parse_date
+from cin7.rate_limiter import get_limiter
+from cin7.scheduler import get_scheduler, LANE_DAILY
+from cin7.retry import (
+    CONNECT_TIMEOUT, READ_TIMEOUT, MAX_RETRIES, RETRY_STATUSES, RETRY_EXCEPTIONS,
+    backoff_delay, retry_after_seconds,
+)
+
+# Configuration
+API_ROOT = 'https://api.cin7.com/api/v1'
+POOL_SIZE = 4  # Connections kept alive per tenant
+ROWS_PER_PAGE = 250
+PREFETCH = 0  # Pages kept in flight per tenant; 0 pages sequentially with requests
+FANOUT = 0  # Worker threads per query once its page count is probed; 0 pages one request at a time
+KEYSET = False  # Page by id > last id seen instead of by page number
+DECODER = 'json'  # How page bodies are decoded: 'json' (response.json()), 'orjson' or 'msgspec'
+PAGE_CACHE = None  # cin7.page_cache.PageCache the raw pages are recorded to (or replayed from)
+REPLAY = False  # Serve every page from PAGE_CACHE instead of the API
+CHECKPOINTS = None  # cin7.checkpoint.CheckpointStore every query's progress is saved to
+CHECKPOINT_DROPBOX = None  # Dropbox path CHECKPOINTS is uploaded to at the end of the run
+
+LOCK = threading.Lock()  # Prevent two threads building the same tenant client
+
+# One client (and therefore one connection pool) per tenant
+clients = {}
+
+
+class Cin7Client:
+    """Keep-alive HTTP client for a single Cin7 tenant.
+
+    The auth header is built once and the underlying ``requests.Session``
+    reuses its TCP/TLS connection across every page request. Every request
+    first takes a token from the tenant's rate limiter through its
+    :class:`~cin7.scheduler.FairScheduler`, has connect/read timeouts, and
+    is retried with backoff on transient failures.
+    """
+
+    def __init__(self, username, key, api_root=API_ROOT, decode=None, cache=None, checkpoints=None, fanout=0,
+                 keyset=False):
+        self.username = username
+        self.api_root = api_root
+        self.fanout = fanout  # Workers per query for FanOutPageStream; 0 uses PageStream
+        self.keyset = keyset  # Page with cin7.keyset.KeysetPageStream
+        self.decode = decode  # decode(endpoint, body) from page_decoder(); None uses response.json()
+        self.cache = cache  # PageCache every complete crawl is recorded to
+        self.checkpoints = checkpoints  # CheckpointStore every page is checkpointed to
+        self.limiter = get_limiter(username)
+        self.scheduler = get_scheduler(username)
+
+        credentials = f"{username}:{key}"
+        encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Basic {encoded_credentials}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, endpoint, params=None, lane=LANE_DAILY, weight=1.0):
+        """GET ``endpoint`` (e.g. 'SalesOrders') and return ``(data, error)``; see :meth:`fetch`."""
+        data, _, error = self.fetch(endpoint, params, lane, weight)
+        return data, error
+
+    def fetch(self, endpoint, params=None, lane=LANE_DAILY, weight=1.0):
+        """GET ``endpoint`` and return ``(data, raw body, error)``.
+
+        The request waits its turn in ``lane`` as part of the ``endpoint``
+        flow, with ``weight`` as that flow's share of the tenant's budget.
+
+        429/5xx responses, timeouts and dropped connections are retried up to
+        MAX_RETRIES times, waiting for ``Retry-After`` when the server sends
+        one and for an exponential, jittered backoff otherwise. A 429 also
+        slows the tenant's limiter down. ``error`` is only set once the
+        retries are exhausted or the failure is not transient (e.g. 401).
+        Every attempt is recorded in :mod:`cin7.metrics`.
+        """
+        url = f"{self.api_root}/{endpoint}"
+        error = None
+
+        for attempt in range(MAX_RETRIES + 1):
+            queued = time.perf_counter()
+            self.scheduler.acquire(endpoint, lane, weight)
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+                received = time.perf_counter()
+                failed = response.status_code in RETRY_STATUSES or response.status_code >= 400
+                metrics.record_request(self.username, endpoint, received - started, len(response.content),
+                                       started - queued, failed)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    data = response.json() if self.decode is None else self.decode(endpoint, response.content)
+                    metrics.record_stage(self.username, endpoint, 'decode', time.perf_counter() - received)
+                    self.limiter.relax()
+                    return data, response.content, None
+
+                error = f"{response.status_code} {response.reason} for url: {response.url}"
+                delay = retry_after_seconds(response)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                if response.status_code == 429:
+                    self.limiter.throttle(delay)
+            except RETRY_EXCEPTIONS as e:
+                metrics.record_request(self.username, endpoint, time.perf_counter() - started, 0,
+                                       started - queued, failed=True)
+                error = str(e)
+                delay = backoff_delay(attempt)
+            except (requests.RequestException, ValueError) as e:
+                return None, None, str(e)
+
+            if attempt < MAX_RETRIES:
+                logging.warning(f"{endpoint} request for {self.username} failed ({error}); "
+                                f"retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+                time.sleep(delay)
+                metrics.record_retry_wait(self.username, endpoint, delay)
+
+        return None, None, error
+
+    def last_page(self, endpoint, params, lane=LANE_DAILY, weight=1.0, first_page=1):
+        """Find the last non-empty page of a query, from ``first_page`` on; returns ``(page, error)``.
+
+        Pages ``first_page``, +1, +3, +7, ... are probed until one comes back
+        empty, then the gap is bisected, so N pages take about 2*log2(N)
+        requests. Probes only ask for ``fields=id``, which keeps each one a
+        small fraction of a full page. ``first_page - 1`` means there is no
+        data from ``first_page`` on.
+        """
+        probe = dict(params, fields='id')
+        probe.setdefault('rows', ROWS_PER_PAGE)
+        low, high = first_page - 1, None  # low has rows (or precedes the range), high is empty
+        step = 1
+        while high is None or high - low > 1:
+            page = first_page - 1 + step if high is None else (low + high) // 2
+            data, error = self.get(endpoint, dict(probe, page=page), lane, weight)
+            if error:
+                return None, error
+            if data:
+                low = page
+                step *= 2
+            else:
+                high = page
+        return low, None
+
+    def iter_pages(self, endpoint, params, lane=LANE_DAILY, weight=1.0, stop_before=None):
+        """Page through ``endpoint``; see :class:`PageStream` and, with ``fanout``, :class:`FanOutPageStream`.
+
+        With ``keyset`` queries page by id (:class:`cin7.keyset.KeysetPageStream`).
+        Newest-first streams (``stop_before``) keep their own order and always
+        page sequentially: probing the page count would cost more than the few
+        pages they read.
+        """
+        if self.keyset and not stop_before:
+            from cin7.keyset import KeysetPageStream
+            return KeysetPageStream(self, endpoint, params, lane, weight)
+        if self.fanout and not stop_before:
+            return FanOutPageStream(self, endpoint, params, self.fanout, lane, weight)
+        return PageStream(self, endpoint, params, lane, weight, stop_before)
+
+    def close(self):
+        self.session.close()
+
+
+class PageStream:
+    """Iterate ``(page, data)`` for a query until Cin7 returns an empty page.
+
+    If a request still fails after its retries the stream stops early and
+    ``error`` holds the reason; ``completed`` is only True when the last
+    page was reached. When the client has a page cache the raw pages are
+    recorded, and kept only if the stream completes. The caller's time on
+    each page is recorded as the ``transform`` stage of :mod:`cin7.metrics`.
+
+    When the client has a checkpoint store, every page the caller is done
+    with is checkpointed; a resumed stream first yields the checkpointed
+    pages again and then carries on from the page after them.
+
+    ``stop_before`` is a ``(field, cutoff)`` pair for queries ordered
+    newest-first on ``field`` (see :func:`newest_first`): the stream ends
+    after a page shorter than ``rows``, or without yielding a page whose
+    records are all older than ``cutoff``.
+    """
+
+    def __init__(self, client, endpoint, params, lane=LANE_DAILY, weight=1.0, stop_before=None):
+        self.client = client
+        self.endpoint = endpoint
+        self.params = dict(params)
+        self.lane = lane
+        self.weight = weight
+        self.stop_before = stop_before
+        self.params.setdefault('rows', ROWS_PER_PAGE)
+        self.error = None
+        self.completed = False
+
+    def past_window(self, data):
+        """True when every record of a newest-first page is older than the cutoff."""
+        field, cutoff = self.stop_before
+        dates = [parse_date(record.get(field)) for record in data]
+        return all(date is not None and date < cutoff for date in dates)
+
+    def resumed(self, checkpoint):
+        """Yield ``(page, data, body)`` for the pages ``checkpoint`` already holds; makes no API calls."""
+        decode = self.client.decode or (lambda endpoint, body: json.loads(body))
+        for page, body in checkpoint.bodies():
+            logging.info(f"Resuming page {page} for user {self.client.username} from the checkpoint...")
+            yield page, decode(self.endpoint, body), body
+
+    def __iter__(self):
+        username = self.client.username
+        recorder = self.client.cache.recorder(username, self.endpoint, self.params) if self.client.cache else None
+        checkpoints = self.client.checkpoints
+        checkpoint = checkpoints.open(username, self.endpoint, self.params) if checkpoints else None
+        first_page = 1
+        try:
+            if checkpoint:
+                for page, data, body in self.resumed(checkpoint):
+                    if recorder:
+                        recorder.put(page, body)
+                    with metrics.processing(username, self.endpoint):
+                        yield page, data
+                self.completed = checkpoint.completed
+                first_page = checkpoint.pages + 1
+
+            if not self.completed:
+                for page, data, body in self.fetched(first_page):
+                    if self.stop_before and self.past_window(data):
+                        logging.info(f"Page {page} for user {username} is older than the window; stopping early.")
+                        self.completed = True
+                        break
+                    if recorder:
+                        recorder.put(page, body)
+                    with metrics.processing(username, self.endpoint):
+                        yield page, data
+                    if checkpoint:
+                        checkpoint.save(page, body)
+                    logging.info(f"Page {page} processed for user {username}.")
+                    if self.stop_before and len(data) < int(self.params['rows']):
+                        logging.info(f"Page {page} for user {username} was the last one.")
+                        self.completed = True
+                        break
+                if self.completed and checkpoint:
+                    checkpoint.complete()
+
+            if self.completed and recorder:
+                recorder.commit()
+        finally:
+            if recorder:
+                recorder.close()
+
+    def fetched(self, page):
+        """Yield ``(page, data, body)`` from ``page`` on, one request at a time.
+
+        Stops at the first empty page (setting ``completed``) or at the
+        first request that still fails after its retries (setting ``error``).
+        Subclasses change how the pages are requested by overriding this.
+        """
+        username = self.client.username
+        while True:
+            logging.info(f"Fetching page {page} for user {username}...")
+            data, body, error = self.client.fetch(self.endpoint, dict(self.params, page=page), self.lane, self.weight)
+            if error:
+                logging.error(f"API call failed for user {username}: {error}")
+                self.error = error
+                return
+
+            if not data:
+                logging.info(f"No more data to fetch for user {username}.")
+                self.completed = True
+                return
+
+            yield page, data, body
+            page += 1
+
+
+class FanOutPageStream(PageStream):
+    """:class:`PageStream` that requests a known range of pages in parallel.
+
+    The last non-empty page is found first with :meth:`Cin7Client.last_page`;
+    pages up to it are then requested by ``workers`` threads, at most
+    ``window`` pages ahead of the caller, and handed over in page order.
+    Every request still queues in the tenant's scheduler, so the fan-out
+    fills the rate budget instead of exceeding it. Once the probed range
+    is done the stream pages on one request at a time, which confirms the
+    end and picks up any records added since the probe.
+    """
+
+    def __init__(self, client, endpoint, params, workers, lane=LANE_DAILY, weight=1.0):
+        super().__init__(client, endpoint, params, lane, weight)
+        self.workers = workers
+        self.window = 2 * workers  # Pages held ahead of the caller
+
+    def fetched(self, page):
+        username = self.client.username
+        last_page, error = self.client.last_page(self.endpoint, self.params, self.lane, self.weight, page)
+        if error:
+            logging.error(f"API call failed for user {username}: {error}")
+            self.error = error
+            return
+        logging.info(f"{self.endpoint} for user {username} ends at page {last_page}; "
+                     f"fetching pages {page}-{last_page} with {self.workers} workers")
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"cin7-{username}")
+        pending = collections.deque()
+        next_page = page
+        try:
+            while pending or next_page <= last_page:
+                while next_page <= last_page and len(pending) < self.window:
+                    logging.info(f"Fetching page {next_page} for user {username}...")
+                    pending.append((next_page, executor.submit(self.client.fetch, self.endpoint,
+                                                               dict(self.params, page=next_page),
+                                                               self.lane, self.weight)))
+                    next_page += 1
+
+                page, request = pending.popleft()
+                data, body, error = request.result()
+                if error:
+                    logging.error(f"API call failed for user {username}: {error}")
+                    self.error = error
+                    return
+                if not data:
+                    # Records were removed from the window since the probe: this is the end
+                    logging.info(f"No more data to fetch for user {username}.")
+                    self.completed = True
+                    return
+                yield page, data, body
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        yield from super().fetched(last_page + 1)
+
+
+def query_key(params):
+    """Stable name for a query: everything but the page number."""
+    query = {name: value for name, value in params.items() if name != 'page'}
+    return hashlib.sha1(json.dumps(query, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def newest_first(params, field, start_date, end_date, grace_hours):
+    """Query ``params`` ordered by ``field`` descending, and the ``stop_before`` rule that ends it.
+
+    The server filters ``field`` from ``start_date`` less ``grace_hours``
+    to ``end_date``, so paging ends at the short last page as usual; the
+    margin keeps records whose date was edited after they were listed.
+    ``stop_before`` is only a safety net for a server that ignores the
+    filter: paging then stops at the first page older than the margin.
+    """
+    cutoff = start_date - datetime.timedelta(hours=grace_hours)
+    return dict(params, where=date_where(field, cutoff, end_date), order=f"{field} DESC"), (field, cutoff)
+
+
+def format_api_date(date):
+    """Format an aware datetime the way Cin7 expects it in a ``where`` clause."""
+    return date.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def date_where(field, start_date, end_date):
+    """Build a server-side ``where`` filter for ``start_date <= field <= end_date``."""
+    return f"{field}>='{format_api_date(start_date)}' AND {field}<='{format_api_date(end_date)}'"
+
+
+def configure(prefetch=0, decoder='json', cache=None, replay=None, retention=None,
+              checkpoint=None, resume=False, checkpoint_dropbox=None, fanout=0, keyset=False):
+    """Choose the client for the run: sequential (``prefetch=0``) or the asyncio prefetch engine,
+    and how page bodies are decoded (see :func:`page_decoder`). With ``fanout`` the sequential
+    client probes each query's page count and fetches its pages with that many workers; with
+    ``keyset`` it pages by id instead, and takes precedence over both.
+
+    ``cache`` is a directory every complete crawl is recorded to as raw,
+    zstd-compressed pages; ``replay`` is a directory of recorded pages to
+    serve instead of calling the API. Cached queries older than
+    ``retention`` days are deleted when either is opened.
+
+    ``checkpoint`` is a SQLite file every page is checkpointed to (see
+    :class:`cin7.checkpoint.CheckpointStore`); with ``resume`` each query
+    continues from its checkpoint. ``checkpoint_dropbox`` carries the file
+    between runner sessions.
+    """
+    global PREFETCH, FANOUT, KEYSET, DECODER, PAGE_CACHE, REPLAY, CHECKPOINTS, CHECKPOINT_DROPBOX
+    PREFETCH = prefetch
+    FANOUT = fanout
+    KEYSET = keyset
+    DECODER = decoder
+    PAGE_CACHE = None
+    REPLAY = bool(replay)
+    if cache or replay:
+        from cin7.page_cache import PageCache  # zstandard is only needed in these modes
+        PAGE_CACHE = PageCache(replay or cache, retention)
+
+    close_checkpoints()
+    CHECKPOINT_DROPBOX = checkpoint_dropbox
+    if (checkpoint or resume) and not REPLAY:
+        from cin7.checkpoint import CHECKPOINT_FILE, open_checkpoints
+        CHECKPOINTS = open_checkpoints(checkpoint or CHECKPOINT_FILE, resume, checkpoint_dropbox)
+        # A crashed run still saves (and uploads) its checkpoints, but never clears them
+        atexit.register(close_checkpoints, clear=False)
+
+
+def page_decoder(name):
+    """``decode(endpoint, body)`` for ``--decoder``; None keeps ``response.json()``.
+
+    ``orjson`` returns the same dicts, parsed faster. ``msgspec`` decodes
+    straight into the typed records of :mod:`cin7.decode`, skipping the
+    fields the mappers never read.
+    """
+    if name == 'msgspec':
+        from cin7.decode import decode_page  # msgspec is only needed in this mode
+        return decode_page
+    if name == 'orjson':
+        import orjson
+        return lambda endpoint, body: orjson.loads(body)
+    return None
+
+
+def get_client(username, key):
+    """Return the shared client for ``username``, creating it on first use."""
+    with LOCK:
+        client = clients.get(username)
+        if client is None:
+            decode = page_decoder(DECODER)
+            if REPLAY:
+                from cin7.page_cache import ReplayClient
+                client = ReplayClient(username, PAGE_CACHE, decode, keyset=KEYSET)
+            elif PREFETCH and not KEYSET:
+                from cin7.async_client import PrefetchClient  # httpx is only needed in this mode
+                client = PrefetchClient(username, key, window=PREFETCH, decode=decode, cache=PAGE_CACHE,
+                                        checkpoints=CHECKPOINTS)
+            else:
+                client = Cin7Client(username, key, decode=decode, cache=PAGE_CACHE, checkpoints=CHECKPOINTS,
+                                    fanout=FANOUT, keyset=KEYSET)
+            clients[username] = client
+        return client
+
+
+def close_clients():
+    """Close every pooled session and save the checkpoints (call once the run is finished)."""
+    with LOCK:
+        for client in clients.values():
+            client.close()
+        clients.clear()
+    close_checkpoints()
+
+
+def close_checkpoints(clear=True):
+    """Save the run's checkpoints; ``clear`` drops them if every query completed."""
+    global CHECKPOINTS
+    if CHECKPOINTS is not None:
+        from cin7.checkpoint import save_checkpoints
+        checkpoints, CHECKPOINTS = CHECKPOINTS, None
+        save_checkpoints(checkpoints, CHECKPOINT_DROPBOX, clear)
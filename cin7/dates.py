@@ -0,0 +1,70 @@
+import datetime
+import functools
+import logging
+
+import pytz
+from dateutil import parser
+
+# Configuration
+CACHE_SIZE = 65536  # Distinct date strings remembered by each cache
+DISPLAY_FORMAT = '%d/%m/%Y'
+
+
+def parse_iso(date_string):
+    """Parse Cin7's ``YYYY-MM-DDTHH:MM:SSZ`` timestamps without dateutil; None for any other shape."""
+    if len(date_string) == 20 and date_string[19] == 'Z' and date_string[10] == 'T':
+        try:
+            return datetime.datetime(
+                int(date_string[0:4]), int(date_string[5:7]), int(date_string[8:10]),
+                int(date_string[11:13]), int(date_string[14:16]), int(date_string[17:19]),
+                tzinfo=pytz.utc,
+            )
+        except ValueError:
+            return None
+
+    try:
+        parsed_date = datetime.datetime.fromisoformat(date_string)
+    except ValueError:
+        return None
+    if parsed_date.tzinfo is None or parsed_date.tzinfo.utcoffset(parsed_date) is None:
+        return pytz.utc.localize(parsed_date)
+    return parsed_date.astimezone(pytz.utc)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_date(date_string):
+    """Parse a Cin7 date string into an aware UTC datetime, or None.
+
+    Orders in a page share a handful of distinct timestamps, so results are
+    cached by input string; the returned datetimes are immutable and safe to
+    share between tenant threads. Anything that is not ISO-8601 goes
+    through dateutil as before.
+    """
+    if not date_string:
+        return None
+
+    # Anything but a string (a number in a date field) fails in dateutil below and returns None
+    parsed_date = parse_iso(date_string) if isinstance(date_string, str) else None
+    if parsed_date is not None:
+        return parsed_date
+
+    try:
+        parsed_date = parser.parse(date_string)
+        if parsed_date.tzinfo is None or parsed_date.tzinfo.utcoffset(parsed_date) is None:
+            parsed_date = pytz.utc.localize(parsed_date)
+        else:
+            parsed_date = parsed_date.astimezone(pytz.utc)
+        return parsed_date
+    except ValueError as e:
+        logging.warning(f"Failed to parse date: {date_string}. Error: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Unexpected error parsing date: {date_string}. Error: {e}")
+        return None
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def format_date(date_string):
+    """``dd/mm/YYYY`` for a Cin7 date string, or '' when it is missing or unparseable."""
+    parsed_date = parse_date(date_string)
+    return parsed_date.strftime(DISPLAY_FORMAT) if parsed_date else ''
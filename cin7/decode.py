@@ -0,0 +1,161 @@
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+import msgspec
+from msgspec import UNSET, UnsetType
+
+# Configuration
+# Values written to the output as Cin7 sends them: kept as str, int or float, never converted
+Scalar = Union[str, int, float, bool, None, UnsetType]
+# Text fields are only copied to the output, so a number or flag where text was expected is kept, not rejected
+Text = Scalar
+# Values the mappers only use through float(): converted while decoding
+Number = Union[float, None, UnsetType]
+
+
+class Record(msgspec.Struct):
+    """Typed Cin7 record that reads like the dict ``response.json()`` returns.
+
+    Only the declared fields are decoded; everything else in the page is
+    skipped without being allocated. A field missing from the response
+    stays ``UNSET``, so ``get``, ``in`` and ``[]`` behave exactly as they
+    do on a dict and the mappers run unchanged.
+    """
+
+    def get(self, name, default=None):
+        value = getattr(self, name, UNSET)
+        return default if value is UNSET else value
+
+    def __contains__(self, name):
+        return getattr(self, name, UNSET) is not UNSET
+
+    def __getitem__(self, name):
+        value = getattr(self, name, UNSET)
+        if value is UNSET:
+            raise KeyError(name)
+        return value
+
+    def to_dict(self):
+        """The decoded fields as a plain dict (what the order store keeps)."""
+        return msgspec.to_builtins(self)
+
+
+class LineItem(Record):
+    code: Text = UNSET
+    name: Text = UNSET
+    qty: Scalar = UNSET
+    option3: Text = UNSET
+    unitPrice: Number = UNSET
+    discount: Number = UNSET
+    createdDate: Text = UNSET
+
+
+class SalesOrder(Record):
+    id: Scalar = UNSET
+    reference: Text = UNSET
+    customerOrderNo: Text = UNSET
+    salesReference: Text = UNSET
+    invoiceNumber: Scalar = UNSET
+    invoiceDate: Text = UNSET
+    createdDate: Text = UNSET
+    modifiedDate: Text = UNSET
+    estimatedDeliveryDate: Text = UNSET
+    dispatchedDate: Text = UNSET
+    completedDate: Text = UNSET
+    company: Text = UNSET
+    firstName: Text = UNSET
+    lastName: Text = UNSET
+    projectName: Text = UNSET
+    source: Text = UNSET
+    currencyCode: Text = UNSET
+    currencyRate: Number = UNSET
+    deliveryCountry: Text = UNSET
+    branchId: Scalar = UNSET
+    taxRate: Scalar = UNSET
+    discountTotal: Number = UNSET
+    accountingAttributes: Optional[Dict[str, Any]] = UNSET
+    customFields: Optional[Dict[str, Any]] = UNSET
+    lineItems: Optional[List[LineItem]] = UNSET
+
+
+class CreditNote(Record):
+    id: Scalar = UNSET
+    reference: Text = UNSET
+    creditNoteNumber: Scalar = UNSET
+    salesReference: Text = UNSET
+    invoiceNumber: Scalar = UNSET
+    createdDate: Text = UNSET
+    modifiedDate: Text = UNSET
+    completedDate: Text = UNSET
+    company: Text = UNSET
+    firstName: Text = UNSET
+    lastName: Text = UNSET
+    projectName: Text = UNSET
+    source: Text = UNSET
+    currencyCode: Text = UNSET
+    currencyRate: Number = UNSET
+    branchId: Scalar = UNSET
+    discountTotal: Number = UNSET
+    accountingAttributes: Optional[Dict[str, Any]] = UNSET
+    lineItems: Optional[List[LineItem]] = UNSET
+
+
+class PurchaseOrder(Record):
+    id: Scalar = UNSET
+    reference: Text = UNSET
+    invoiceNumber: Scalar = UNSET
+    createdDate: Text = UNSET
+    modifiedDate: Text = UNSET
+    estimatedDeliveryDate: Text = UNSET
+    fullyReceivedDate: Text = UNSET
+    company: Text = UNSET
+    firstName: Text = UNSET
+    lastName: Text = UNSET
+    projectName: Text = UNSET
+    source: Text = UNSET
+    currencyCode: Text = UNSET
+    currencyRate: Number = UNSET
+    branchId: Scalar = UNSET
+    status: Text = UNSET
+    stage: Text = UNSET
+    Stage: Text = UNSET
+    internalComments: Text = UNSET
+    isVoid: Union[bool, None, UnsetType] = UNSET
+    lineItems: Optional[List[LineItem]] = UNSET
+
+
+RECORD_TYPES = {
+    'SalesOrders': SalesOrder,
+    'CreditNotes': CreditNote,
+    'PurchaseOrders': PurchaseOrder,
+}
+# One decoder per endpoint; strict=False lets numbers sent as strings ("3.50") convert too
+DECODERS = {endpoint: msgspec.json.Decoder(List[record_type], strict=False)
+            for endpoint, record_type in RECORD_TYPES.items()}
+GENERIC_DECODER = msgspec.json.Decoder()
+
+
+def decode_page(endpoint, content):
+    """Decode one page of ``endpoint`` from the raw response body.
+
+    A record that does not fit its type (say, text in ``currencyRate``)
+    fails the typed decode of the whole page; the page is then decoded
+    record by record, and only the misfits are kept as plain dicts, for
+    the mappers to handle (or report) like any other bad order.
+    """
+    decoder = DECODERS.get(endpoint)
+    if decoder is None:
+        return GENERIC_DECODER.decode(content)
+    try:
+        return decoder.decode(content)
+    except msgspec.ValidationError as e:
+        logging.warning(f"Typed decoding of a {endpoint} page failed ({e}); decoding it record by record")
+        return [decode_record(RECORD_TYPES[endpoint], record) for record in GENERIC_DECODER.decode(content)]
+
+
+def decode_record(record_type, record):
+    try:
+        return msgspec.convert(record, record_type, strict=False)
+    except msgspec.ValidationError as e:
+        logging.warning(f"Kept {record_type.__name__} {record.get('id')} as a plain dict: {e}")
+        return record
@@ -0,0 +1,53 @@
+import json
+import os
+
+import requests
+
+# Dropbox API endpoints
+TOKEN_URL = "https://api.dropbox.com/oauth2/token"
+DOWNLOAD_URL = "https://content.dropboxapi.com/2/files/download"
+UPLOAD_URL = "https://content.dropboxapi.com/2/files/upload"
+
+
+def get_access_token():
+    """Exchange the refresh token from the environment for a short-lived access token."""
+    response = requests.post(
+        TOKEN_URL,
+        data={
+            "grant_type": "refresh_token",
+            "refresh_token": os.environ["DROPBOX_ALL_ACCESS_REFRESH_TOKEN"],
+            "client_id": os.environ["DROPBOX_ALL_ACCESS_APP_KEY"],
+            "client_secret": os.environ["DROPBOX_ALL_ACCESS_APP_SECRET"]
+        },
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def download_file(dropbox_path, local_path):
+    """Download ``dropbox_path`` to ``local_path``. Returns False if it does not exist yet."""
+    headers = {
+        "Authorization": f"Bearer {get_access_token()}",
+        "Dropbox-API-Arg": json.dumps({"path": dropbox_path})
+    }
+    response = requests.post(DOWNLOAD_URL, headers=headers)
+    if response.status_code == 409 and "not_found" in response.text:
+        return False
+    response.raise_for_status()
+
+    os.makedirs(os.path.dirname(os.path.abspath(local_path)), exist_ok=True)
+    with open(local_path, "wb") as f:
+        f.write(response.content)
+    return True
+
+
+def upload_file(local_path, dropbox_path):
+    """Upload ``local_path`` to ``dropbox_path``, overwriting any existing file."""
+    headers = {
+        "Authorization": f"Bearer {get_access_token()}",
+        "Dropbox-API-Arg": json.dumps({"path": dropbox_path, "mode": "overwrite"}),
+        "Content-Type": "application/octet-stream"
+    }
+    with open(local_path, "rb") as f:
+        response = requests.post(UPLOAD_URL, headers=headers, data=f.read())
+    response.raise_for_status()
@@ -0,0 +1,134 @@
+import contextlib
+import importlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from cin7.client import get_client, date_where, newest_first
+from cin7.pipeline import open_sink
+from cin7.scheduler import LANE_DAILY
+
+# Configuration
+OUTPUT_DIR = 'tmp_files'
+
+
+class EntitySpec:
+    """Everything the engine needs to extract one entity.
+
+    ``process_page(data, user_name, start_date, end_date)`` turns one API
+    page into row tuples in ``columns`` order and ``date_range()`` returns
+    the ``(start_date, end_date)`` window filtered on ``date_field``.
+    ``file_name`` is a template formatted with ``start`` and ``end``, e.g.
+    ``"Credit_Notes_{start:%Y%m%d}_{end:%Y%m%d}.csv"``.
+
+    ``lane`` and ``weight`` place the entity's requests in each tenant's
+    :class:`~cin7.scheduler.FairScheduler`: daily work goes ahead of
+    backfills, and within a lane tokens are shared in proportion to weight.
+
+    ``finish()``, when set, runs once every tenant of the entity is done,
+    for whatever the script does after its own run (e.g. Daily_SO writes
+    the orders that failed to transform to ``errores_sales_orders.csv``).
+    """
+
+    def __init__(self, name, endpoint, fields, date_field, columns, process_page, date_range, file_name,
+                 rows_per_page=250, lane=LANE_DAILY, weight=1.0, finish=None):
+        self.name = name
+        self.endpoint = endpoint
+        self.fields = fields
+        self.date_field = date_field
+        self.columns = columns
+        self.process_page = process_page
+        self.date_range = date_range
+        self.file_name = file_name
+        self.rows_per_page = rows_per_page
+        self.lane = lane
+        self.weight = weight
+        self.finish = finish
+
+    @classmethod
+    def from_module(cls, name, module_name, file_name, lane=LANE_DAILY, weight=1.0):
+        """Spec for an extractor script, read from its ``# Configuration`` block.
+
+        ``module_name`` is the script's dotted path from the repository
+        root (e.g. ``'Credit_Notes.Daily_CRN'``); its ``ENDPOINT``,
+        ``FIELDS``, ``DATE_FIELD``, ``COLUMNS``, ``ROWS_PER_PAGE``,
+        ``process_page`` and ``calculate_date_range`` are used as they are,
+        and its ``write_errors``, if it has one, as ``finish``.
+        """
+        module = importlib.import_module(module_name)
+        return cls(name, module.ENDPOINT, module.FIELDS, module.DATE_FIELD, module.COLUMNS, module.process_page,
+                   module.calculate_date_range, file_name, module.ROWS_PER_PAGE, lane, weight,
+                   getattr(module, 'write_errors', None))
+
+
+def extract(spec, user, start_date, end_date, sink, store=None, grace_hours=None):
+    """Page one entity for one tenant into ``sink``; newest-first when ``grace_hours`` is set."""
+    client = get_client(user['username'], user['key'])
+    where = date_where(spec.date_field, start_date, end_date)
+
+    params = {'fields': spec.fields, 'where': where, 'rows': spec.rows_per_page}
+    stop_before = None
+    if grace_hours is not None:
+        params, stop_before = newest_first(params, spec.date_field, start_date, end_date, grace_hours)
+    pages = client.iter_pages(spec.endpoint, params, spec.lane, spec.weight, stop_before=stop_before)
+    for page, data in pages:
+        if store:
+            store.upsert(spec.endpoint, user['username'], data)
+        sink.write(spec.process_page(data, user['username'], start_date, end_date))
+    if pages.error:
+        logging.error(f"{spec.name} for {user['username']} stopped early: {pages.error}")
+
+
+def run_entities(specs, users, output_format='csv', store=None, output_dir=OUTPUT_DIR, grace_hours=None):
+    """Extract every spec for every user in one process; returns ``{spec.name: output path}``.
+
+    Every (entity, tenant) pair runs on its own thread, each entity
+    streaming into its own sink. Pairs for the same tenant share that
+    tenant's client, so they reuse its keep-alive connections and queue
+    in one fair scheduler in front of its rate limiter, and the date and
+    warehouse caches are shared by every entity. As long as any pair has
+    pages left, every tenant's budget stays in use, so the run ends when
+    the total quota has been spent rather than when the slowest thread
+    catches up.
+
+    Only full extracts of each spec's window are run: incremental runs
+    (``modifiedDate`` watermarks) stay with ``Sales_Orders/Daily_SO.py
+    --incremental``. Each spec's ``finish`` runs after its sink is closed.
+
+    Raises ValueError when two specs would write the same output file.
+    """
+    if not specs or not users:
+        logging.warning("No entities or tenants selected; nothing to extract.")
+        return {}
+
+    windows = {spec.name: spec.date_range() for spec in specs}
+    file_paths = {}
+    for spec in specs:
+        start_date, end_date = windows[spec.name]
+        path = os.path.join(output_dir, spec.file_name.format(start=start_date, end=end_date))
+        if path in file_paths.values():
+            other = next(name for name, other_path in file_paths.items() if other_path == path)
+            raise ValueError(f"{other} and {spec.name} would both write {path}; extract them in separate runs")
+        file_paths[spec.name] = path
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    with contextlib.ExitStack() as stack:
+        sinks = {}
+        for spec in specs:
+            sink = open_sink(file_paths[spec.name], spec.columns, output_format, spec.date_field)
+            sinks[spec.name] = stack.enter_context(sink)
+            paths[spec.name] = sink.path
+
+        tasks = [(spec, user) for spec in specs for user in users]
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            futures = [executor.submit(extract, spec, user, *windows[spec.name], sinks[spec.name], store,
+                                       grace_hours)
+                       for spec, user in tasks]
+            for future in futures:
+                future.result()
+
+    for spec in specs:
+        if spec.finish:
+            spec.finish()
+    return paths
@@ -0,0 +1,261 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+# Configuration
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # Upper bounds in seconds
+STAGES = ('fetch', 'decode', 'transform', 'write')
+SUMMARY_SUFFIX = '.metrics.json'
+PROMETHEUS_SUFFIX = '.prom'
+
+LOCK = threading.Lock()  # Guards the registry and every counter in it; never held while waiting
+
+# One set of counters per (tenant, endpoint) for the whole run, and one per output file
+flows = {}
+sinks = {}
+run_started = time.time()
+local = threading.local()  # The flow whose page the current thread is working on
+
+
+class FlowMetrics:
+    """Counters for one tenant's requests to one endpoint.
+
+    ``stages`` holds the seconds spent in each stage of a page: ``fetch``
+    is the HTTP round trip (retried attempts included), ``decode`` turns
+    the body into records, ``transform`` is what the caller does with the
+    page (mapping, store upserts), and ``write`` is the time the caller
+    was blocked handing rows to a full writer queue. ``limiter_wait`` is
+    the time spent queueing for a rate-limit token and ``retry_wait`` the
+    backoff slept between failed attempts. Times are summed per request,
+    so with ``--prefetch`` they can add up to more than the wall time.
+    """
+
+    def __init__(self, tenant, endpoint):
+        self.tenant = tenant
+        self.endpoint = endpoint
+        self.requests = 0
+        self.failures = 0
+        self.bytes = 0
+        self.pages = 0
+        self.rows = 0
+        self.limiter_wait = 0.0
+        self.retry_wait = 0.0
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)  # Non-cumulative; summed when exported
+        self.latency_sum = 0.0
+        self.first = None
+        self.last = None
+
+    def touch(self, now):
+        if self.first is None:
+            self.first = now
+        self.last = now
+
+    def summary(self):
+        elapsed = (self.last - self.first) if self.first is not None else 0.0
+        return {
+            'tenant': self.tenant,
+            'endpoint': self.endpoint,
+            'requests': self.requests,
+            'failures': self.failures,
+            'bytes': self.bytes,
+            'pages': self.pages,
+            'rows': self.rows,
+            'elapsed_seconds': round(elapsed, 3),
+            'pages_per_s': round(self.pages / elapsed, 3) if elapsed else None,
+            'rows_per_s': round(self.rows / elapsed, 1) if elapsed else None,
+            'limiter_wait_seconds': round(self.limiter_wait, 3),
+            'retry_wait_seconds': round(self.retry_wait, 3),
+            'stage_seconds': {stage: round(seconds, 3) for stage, seconds in self.stages.items()},
+            'latency': {
+                'count': self.requests,
+                'sum_seconds': round(self.latency_sum, 3),
+                'buckets': dict(zip((str(bound) for bound in LATENCY_BUCKETS), self.cumulative_buckets())),
+            },
+        }
+
+    def cumulative_buckets(self):
+        total = 0
+        counts = []
+        for count in self.latency_buckets:
+            total += count
+            counts.append(total)
+        return counts
+
+
+def get_flow(tenant, endpoint):
+    """Return the counters for ``tenant`` and ``endpoint``, creating them on first use."""
+    with LOCK:
+        flow = flows.get((tenant, endpoint))
+        if flow is None:
+            flow = FlowMetrics(tenant, endpoint)
+            flows[(tenant, endpoint)] = flow
+        return flow
+
+
+def record_request(tenant, endpoint, latency, size=0, waited=0.0, failed=False):
+    """Count one request attempt that took ``latency`` seconds after ``waited`` seconds for a token."""
+    flow = get_flow(tenant, endpoint)
+    bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), None)
+    with LOCK:
+        flow.touch(time.monotonic())
+        flow.requests += 1
+        flow.failures += failed
+        flow.bytes += size
+        flow.limiter_wait += waited
+        flow.stages['fetch'] += latency
+        flow.latency_sum += latency
+        if bucket is not None:
+            flow.latency_buckets[bucket] += 1
+
+
+def record_stage(tenant, endpoint, stage, seconds):
+    flow = get_flow(tenant, endpoint)
+    with LOCK:
+        flow.stages[stage] += seconds
+
+
+def record_retry_wait(tenant, endpoint, seconds):
+    flow = get_flow(tenant, endpoint)
+    with LOCK:
+        flow.retry_wait += seconds
+
+
+@contextlib.contextmanager
+def processing(tenant, endpoint):
+    """Time what the caller does with one page of ``endpoint``.
+
+    Page streams wrap each ``yield`` in this, so the time until the next
+    page is requested counts as ``transform``, except for the time spent
+    blocked in :func:`record_rows`, which counts as ``write``. Rows handed
+    to a writer meanwhile are credited to this flow.
+    """
+    flow = get_flow(tenant, endpoint)
+    written = flow.stages['write']
+    local.flow = flow
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        local.flow = None
+        with LOCK:
+            flow.touch(time.monotonic())
+            flow.pages += 1
+            flow.stages['transform'] += elapsed - (flow.stages['write'] - written)
+
+
+def record_rows(count, blocked):
+    """Called by a writer when the current thread hands it ``count`` rows, ``blocked`` seconds later."""
+    flow = getattr(local, 'flow', None)
+    if flow is None:
+        return  # Rows rebuilt from the store belong to no API flow
+    with LOCK:
+        flow.rows += count
+        flow.stages['write'] += blocked
+
+
+def record_sink(path, rows, busy):
+    """Totals of one output file: rows written and seconds its writer thread spent writing them."""
+    with LOCK:
+        sinks[path] = {'rows': rows, 'write_seconds': round(busy, 3)}
+
+
+def summary():
+    """The run so far as a JSON-ready dict."""
+    with LOCK:
+        flow_summaries = [flow.summary() for _, flow in sorted(flows.items())]
+        sink_summaries = dict(sinks)
+    return {
+        'started': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(run_started)),
+        'elapsed_seconds': round(time.time() - run_started, 3),
+        'flows': flow_summaries,
+        'sinks': sink_summaries,
+    }
+
+
+def label_text(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def prometheus_text(run):
+    """Render :func:`summary` in the Prometheus text exposition format."""
+    lines = [
+        '# HELP cin7_run_elapsed_seconds Wall time of the extraction run.',
+        '# TYPE cin7_run_elapsed_seconds gauge',
+        f"cin7_run_elapsed_seconds {run['elapsed_seconds']}",
+        '# HELP cin7_run_timestamp_seconds When the extraction run started.',
+        '# TYPE cin7_run_timestamp_seconds gauge',
+        f"cin7_run_timestamp_seconds {round(run_started)}",
+    ]
+    counters = (
+        ('requests', 'cin7_requests_total', 'API request attempts.'),
+        ('failures', 'cin7_request_failures_total', 'API request attempts that failed.'),
+        ('bytes', 'cin7_downloaded_bytes_total', 'Response body bytes downloaded.'),
+        ('pages', 'cin7_pages_total', 'Pages handed to the extractor.'),
+        ('rows', 'cin7_rows_total', 'Rows handed to the writer.'),
+        ('limiter_wait_seconds', 'cin7_limiter_wait_seconds_total', 'Seconds spent waiting for a rate-limit token.'),
+        ('retry_wait_seconds', 'cin7_retry_wait_seconds_total', 'Seconds slept before retrying a failed request.'),
+    )
+    for key, name, description in counters:
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        lines += [f"{name}{{{label_text(tenant=flow['tenant'], endpoint=flow['endpoint'])}}} {flow[key]}"
+                  for flow in run['flows']]
+
+    lines += ['# HELP cin7_stage_seconds_total Seconds spent in each stage of a page.',
+              '# TYPE cin7_stage_seconds_total counter']
+    for flow in run['flows']:
+        for stage, seconds in flow['stage_seconds'].items():
+            labels = label_text(tenant=flow['tenant'], endpoint=flow['endpoint'], stage=stage)
+            lines.append(f"cin7_stage_seconds_total{{{labels}}} {seconds}")
+
+    lines += ['# HELP cin7_request_duration_seconds API request latency.',
+              '# TYPE cin7_request_duration_seconds histogram']
+    for flow in run['flows']:
+        labels = label_text(tenant=flow['tenant'], endpoint=flow['endpoint'])
+        latency = flow['latency']
+        for bound, count in latency['buckets'].items():
+            lines.append(f'cin7_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'cin7_request_duration_seconds_bucket{{{labels},le="+Inf"}} {latency["count"]}')
+        lines.append(f"cin7_request_duration_seconds_sum{{{labels}}} {latency['sum_seconds']}")
+        lines.append(f"cin7_request_duration_seconds_count{{{labels}}} {latency['count']}")
+
+    lines += ['# HELP cin7_writer_seconds_total Seconds a writer thread spent writing rows to its file.',
+              '# TYPE cin7_writer_seconds_total counter']
+    for path, sink in run['sinks'].items():
+        lines.append(f"cin7_writer_seconds_total{{{label_text(file=os.path.basename(path))}}} "
+                     f"{sink['write_seconds']}")
+    return '\n'.join(lines) + '\n'
+
+
+def write_atomic(path, text):
+    """Write ``text`` so a reader (e.g. node_exporter's textfile collector) never sees half a file."""
+    scratch = f"{path}.tmp"
+    with open(scratch, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(scratch, path)
+
+
+def write_metrics(output_path):
+    """Write the run summary next to ``output_path`` as JSON and as a Prometheus textfile.
+
+    Returns the two paths; also logs where each flow's time went.
+    """
+    run = summary()
+    base = os.path.splitext(output_path)[0]
+    json_path = base + SUMMARY_SUFFIX
+    prometheus_path = base + PROMETHEUS_SUFFIX
+    write_atomic(json_path, json.dumps(run, indent=2))
+    write_atomic(prometheus_path, prometheus_text(run))
+
+    for flow in run['flows']:
+        stages = ', '.join(f"{stage} {seconds:.1f}s" for stage, seconds in flow['stage_seconds'].items())
+        logging.info(f"{flow['tenant']} {flow['endpoint']}: {flow['pages']} pages, {flow['rows']} rows, "
+                     f"{flow['bytes'] / 2 ** 20:.1f} MiB in {flow['elapsed_seconds']:.1f}s "
+                     f"(limiter {flow['limiter_wait_seconds']:.1f}s, retries {flow['retry_wait_seconds']:.1f}s, "
+                     f"{stages})")
+    logging.info(f"Run metrics written to {json_path} and {prometheus_path}")
+    return json_path, prometheus_path
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+import zstandard
+
+from cin7 import metrics
+from cin7.client import PageStream, query_key
+from cin7.rate_limiter import get_limiter
+from cin7.scheduler import LANE_DAILY
+
+# Configuration
+COMPRESSION_LEVEL = 3
+PAGE_FILE = 'page-{:05d}.json.zst'
+QUERY_FILE = 'query.json'
+
+
+class PageCache:
+    """zstd-compressed raw API pages on disk, laid out as
+    ``<directory>/<tenant>/<endpoint>/<query key>/page-NNNNN.json.zst``.
+
+    Only complete crawls are kept: a crawl is written to a scratch
+    directory and swapped in once its empty last page arrives, so a query
+    directory always holds one whole, consistent result set. Query
+    directories older than ``retention_days`` are deleted when the cache
+    is opened.
+    """
+
+    def __init__(self, directory, retention_days=None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        if retention_days is not None:
+            self.prune(retention_days)
+
+    def query_dir(self, tenant, endpoint, params):
+        return os.path.join(self.directory, tenant, endpoint, query_key(params))
+
+    def recorder(self, tenant, endpoint, params):
+        return PageRecorder(self.query_dir(tenant, endpoint, params), params)
+
+    def iter_bodies(self, tenant, endpoint, params):
+        """Yield ``(page, raw body)`` for a cached query; nothing when it was never cached."""
+        directory = self.query_dir(tenant, endpoint, params)
+        decompressor = zstandard.ZstdDecompressor()
+        page = 1
+        while True:
+            path = os.path.join(directory, PAGE_FILE.format(page))
+            if not os.path.exists(path):
+                return
+            with open(path, 'rb') as f:
+                yield page, decompressor.decompress(f.read())
+            page += 1
+
+    def has(self, tenant, endpoint, params):
+        return os.path.exists(os.path.join(self.query_dir(tenant, endpoint, params), QUERY_FILE))
+
+    def prune(self, retention_days):
+        """Delete cached queries last crawled more than ``retention_days`` days ago."""
+        cutoff = time.time() - retention_days * 86400
+        removed = 0
+        for root, dirs, files in os.walk(self.directory):
+            # Scratch directories left behind by interrupted crawls expire too
+            abandoned = ('.partial-' in root or '.old-' in root) and os.path.getmtime(root) < cutoff
+            if abandoned or QUERY_FILE in files and os.path.getmtime(os.path.join(root, QUERY_FILE)) < cutoff:
+                shutil.rmtree(root, ignore_errors=True)
+                removed += 1
+                dirs[:] = []
+        if removed:
+            logging.info(f"Pruned {removed} cached queries older than {retention_days} days from {self.directory}")
+
+
+class PageRecorder:
+    """Writes one crawl of a query into a scratch directory; :meth:`commit` makes it the cached copy."""
+
+    def __init__(self, directory, params):
+        self.directory = directory
+        self.params = params
+        self.scratch = f"{directory}.partial-{uuid.uuid4().hex[:8]}"
+        self.compressor = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL)
+        os.makedirs(self.scratch)
+
+    def put(self, page, body):
+        with open(os.path.join(self.scratch, PAGE_FILE.format(page)), 'wb') as f:
+            f.write(self.compressor.compress(body))
+
+    def commit(self):
+        with open(os.path.join(self.scratch, QUERY_FILE), 'w', encoding='utf-8') as f:
+            json.dump({name: value for name, value in self.params.items() if name != 'page'}, f, indent=2)
+        previous = f"{self.directory}.old-{uuid.uuid4().hex[:8]}"
+        if os.path.exists(self.directory):
+            os.replace(self.directory, previous)
+        os.replace(self.scratch, self.directory)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    def close(self):
+        """Drop the scratch directory of a crawl that was not committed."""
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+
+class ReplayPageStream(PageStream):
+    """:class:`PageStream` over the cached pages of a query; makes no API calls."""
+
+    def __iter__(self):
+        client = self.client
+        if not client.page_cache.has(client.username, self.endpoint, self.params):
+            self.error = f"{self.endpoint} query not in the page cache; run once with --cache to record it"
+            logging.error(f"Replay for user {client.username}: {self.error}")
+            return
+        bodies = client.page_cache.iter_bodies(client.username, self.endpoint, self.params)
+        while True:
+            started = time.perf_counter()
+            page, body = next(bodies, (None, None))
+            if body is None:
+                break
+            read = time.perf_counter()
+            logging.info(f"Replaying page {page} for user {client.username}...")
+            data = client.decode(self.endpoint, body)
+            # Reading the cache stands in for the request, with no limiter wait
+            metrics.record_request(client.username, self.endpoint, read - started, len(body))
+            metrics.record_stage(client.username, self.endpoint, 'decode', time.perf_counter() - read)
+            with metrics.processing(client.username, self.endpoint):
+                yield page, data
+        self.completed = True
+
+
+class ReplayClient:
+    """Stand-in for :class:`cin7.client.Cin7Client` that serves every page from a :class:`PageCache`."""
+
+    def __init__(self, username, page_cache, decode=None, keyset=False):
+        self.username = username
+        self.page_cache = page_cache
+        self.keyset = keyset  # Replay the crawls recorded with --keyset
+        self.cache = None  # Replayed pages are never recorded again
+        self.checkpoints = None
+        self.decode = decode or (lambda endpoint, body: json.loads(body))
+        self.limiter = get_limiter(username)  # Only read for usage figures; never acquired
+
+    def iter_pages(self, endpoint, params, lane=LANE_DAILY, weight=1.0, stop_before=None):
+        # Replays exactly the pages that were recorded, so no stop rule is needed
+        if self.keyset and not stop_before:
+            from cin7.keyset import keyset_query
+            params = keyset_query(params)
+        return ReplayPageStream(self, endpoint, params, lane, weight)
+
+    def close(self):
+        pass
@@ -0,0 +1,118 @@
+import csv
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+from cin7 import metrics
+
+# Configuration
+QUEUE_DEPTH = 16  # Pages buffered between the tenant threads and the writer
+WRITE_BUFFER = 1 << 20  # Bytes buffered before each write to disk
+
+DONE = object()  # Tells the writer thread to finish
+
+
+def intern_value(value):
+    """Share one copy of a repeated order-level string (company, currency, ...) across rows."""
+    return sys.intern(value) if type(value) is str else value
+
+
+class RowWriter:
+    """Stream transformed rows to a CSV file while the pages are still being fetched.
+
+    Rows are tuples in ``fieldnames`` order. Tenant threads call
+    :meth:`write` once per page; a single writer thread appends each page
+    with one ``writerows`` call through a large file buffer. The queue
+    holds at most ``QUEUE_DEPTH`` pages, so peak memory is bounded by the
+    queue depth rather than by the size of the extract, and a slow disk
+    makes the fetchers wait instead of piling rows up in memory. The time
+    producers spend blocked on the queue and the writer thread's own
+    writing time are recorded in :mod:`cin7.metrics`.
+
+    Use it as a context manager; the file is complete once the ``with``
+    block exits. Subclasses change the file format by overriding
+    :meth:`open`, :meth:`write_rows` and :meth:`close`.
+    """
+
+    def __init__(self, path, fieldnames, depth=QUEUE_DEPTH):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.queue = queue.Queue(maxsize=depth)
+        self.thread = threading.Thread(target=self.run, name="cin7-writer", daemon=True)
+        self.rows_written = 0
+        self.busy = 0.0  # Seconds the writer thread spent in write_rows
+        self.error = None
+
+    def __enter__(self):
+        self.open()
+        self.thread.start()
+        return self
+
+    def open(self):
+        self.csv_file = open(self.path, mode='w', newline='', encoding='utf-8', buffering=WRITE_BUFFER)
+        self.writer = csv.writer(self.csv_file)
+        self.writer.writerow(self.fieldnames)
+
+    def write_rows(self, rows):
+        """Called on the writer thread with one page of rows."""
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.csv_file.close()
+
+    def write(self, rows):
+        """Queue one page of rows; blocks while the writer is ``depth`` pages behind."""
+        if self.error is not None:
+            raise self.error
+        if rows:
+            started = time.perf_counter()
+            self.queue.put(rows)
+            metrics.record_rows(len(rows), time.perf_counter() - started)
+
+    def run(self):
+        while True:
+            rows = self.queue.get()
+            if rows is DONE:
+                break
+            if self.error is not None:
+                continue  # Keep draining so producers never block on a dead writer
+            started = time.perf_counter()
+            try:
+                self.write_rows(rows)
+                self.rows_written += len(rows)
+            except Exception as e:
+                self.error = e
+            self.busy += time.perf_counter() - started
+
+    def __exit__(self, exc_type, exc, tb):
+        self.queue.put(DONE)
+        self.thread.join()
+        started = time.perf_counter()
+        try:
+            self.close()
+        except Exception as e:
+            self.error = self.error or e
+        self.busy += time.perf_counter() - started  # Parquet and xlsx flush most of their work on close
+        metrics.record_sink(self.path, self.rows_written, self.busy)
+        if self.error is not None and exc is None:
+            raise self.error
+        logging.info(f"{self.rows_written} rows streamed to {self.path}")
+        return False
+
+
+def open_sink(path, fieldnames, output_format='csv', date_column=None):
+    """Row writer for ``--output-format``.
+
+    ``csv`` and ``xlsx`` write ``path``; ``parquet`` writes a directory
+    named after it, partitioned by tenant and by the month of ``date_column``.
+    """
+    if output_format == 'parquet':
+        from cin7.parquet_writer import ParquetRowWriter  # Needs pyarrow; only imported when asked for
+        return ParquetRowWriter(os.path.splitext(path)[0], fieldnames, date_column)
+    if output_format == 'xlsx':
+        from cin7.xlsx_writer import XlsxRowWriter
+        return XlsxRowWriter(path, fieldnames)
+    return RowWriter(path, fieldnames)
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Configuration
+LEDGER_FILE = os.environ.get("CIN7_QUOTA_LEDGER", os.path.join(tempfile.gettempdir(), "cin7_quota.sqlite"))
+
+LOCK = threading.Lock()  # Guards creation of the shared ledger
+
+ledger = None
+
+
+class QuotaLedger:
+    """File-backed record of the Cin7 calls made by every process on this machine.
+
+    Each call is a row in a small SQLite table; reservations run inside a
+    ``BEGIN IMMEDIATE`` transaction so two processes can never both take
+    the last call of a window.
+    """
+
+    def __init__(self, path=LEDGER_FILE, clock=time.time):
+        self.path = path
+        self.clock = clock  # Wall clock: it has to mean the same thing in every process
+        self.local = threading.local()  # sqlite3 connections are per thread
+
+        with self.connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS calls (tenant TEXT NOT NULL, ts REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS calls_tenant_ts ON calls (tenant, ts)')
+
+    def connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self.local.conn = conn
+        return conn
+
+    def reserve(self, tenant, windows):
+        """Record a call for ``tenant`` if every window allows it.
+
+        Returns 0 when the call was reserved, otherwise the seconds until the
+        oldest call of the full window expires.
+        """
+        conn = self.connect()
+        now = self.clock()
+        longest = max(window for window, _ in windows)
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM calls WHERE tenant = ? AND ts <= ?', (tenant, now - longest))
+
+            wait = 0.0
+            for window, limit in windows:
+                count, oldest = conn.execute(
+                    'SELECT COUNT(*), MIN(ts) FROM calls WHERE tenant = ? AND ts > ?',
+                    (tenant, now - window),
+                ).fetchone()
+                if count >= limit:
+                    wait = max(wait, oldest + window - now)
+
+            if not wait:
+                conn.execute('INSERT INTO calls (tenant, ts) VALUES (?, ?)', (tenant, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def usage(self, tenant):
+        """Calls made by all processes in the current day, hour and minute windows."""
+        conn = self.connect()
+        now = self.clock()
+        counts = {}
+        for window in (86400, 3600, 60):
+            counts[window] = conn.execute(
+                'SELECT COUNT(*) FROM calls WHERE tenant = ? AND ts > ?', (tenant, now - window)
+            ).fetchone()[0]
+        return {"api_calls": counts[86400], "hour_calls": counts[3600], "minute_calls": counts[60]}
+
+
+def get_ledger():
+    """Return the machine-wide ledger (``$CIN7_QUOTA_LEDGER``), or None when set to ``off``."""
+    global ledger
+    with LOCK:
+        if ledger is None and LEDGER_FILE.lower() != 'off':
+            ledger = QuotaLedger(LEDGER_FILE)
+        return ledger
@@ -0,0 +1,144 @@
+import collections
+import threading
+import time
+
+from cin7.quota_ledger import get_ledger
+
+# Cin7 API limits per account: (window in seconds, calls allowed in that window)
+SECOND_LIMIT = 3
+MINUTE_LIMIT = 60
+HOUR_LIMIT = 3600
+DAILY_LIMIT = 5000
+
+WINDOWS = (
+    (1, SECOND_LIMIT),
+    (60, MINUTE_LIMIT),
+    (3600, HOUR_LIMIT),
+    (86400, DAILY_LIMIT),
+)
+
+MAX_INTERVAL = 10.0  # Slowest spacing between calls after repeated 429s
+
+LOCK = threading.Lock()  # Guards the registry only, never held while sleeping
+
+# One limiter per tenant
+limiters = {}
+
+
+class RateLimiter:
+    """Token bucket for one tenant, refilled over sliding windows.
+
+    Each window keeps the timestamps of the tokens spent inside it; a
+    token is available when every window is below its limit. The lock is
+    only held while the windows are checked, so callers waiting for a
+    token sleep without blocking other threads or tenants.
+
+    With a ``ledger`` the token must also be reserved in the machine-wide
+    quota ledger, so separate extractor processes share one budget. The
+    token is held in the windows while the ledger is asked (outside the
+    lock: its transaction can wait on other processes) and handed back if
+    the ledger refuses it.
+
+    After a 429 the limiter backs off on top of the windows: ``throttle``
+    blocks the tenant for the server's delay and doubles the spacing
+    between calls, and every successful call ``relax``es it again.
+    """
+
+    def __init__(self, name, windows=WINDOWS, clock=time.monotonic, ledger=None):
+        self.name = name
+        self.clock = clock
+        self.limits = windows
+        self.ledger = ledger
+        self.lock = threading.Lock()
+        self.windows = [(window, limit, collections.deque()) for window, limit in windows]
+        self.interval = 0.0  # Extra spacing between calls while recovering from a 429
+        self.blocked_until = 0.0
+        self.last_call = None
+
+    def reserve(self):
+        """Take a token if one is free. Returns 0, or the seconds to wait before retrying."""
+        with self.lock:
+            now = self.clock()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.interval and self.last_call is not None and now - self.last_call < self.interval:
+                return self.last_call + self.interval - now
+
+            wait = 0.0
+            for window, limit, calls in self.windows:
+                while calls and calls[0] <= now - window:
+                    calls.popleft()
+                if len(calls) >= limit:
+                    wait = max(wait, calls[0] + window - now)
+
+            if wait > 0:
+                return wait
+
+            for _, _, calls in self.windows:
+                calls.append(now)
+            last_call, self.last_call = self.last_call, now
+
+        if self.ledger is not None:
+            wait = self.ledger.reserve(self.name, self.limits)
+            if wait > 0:
+                with self.lock:
+                    for _, _, calls in self.windows:
+                        if now in calls:
+                            calls.remove(now)
+                    if self.last_call == now:
+                        self.last_call = last_call
+                return wait
+        return 0.0
+
+    def acquire(self):
+        """Block until a token is available. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self.reserve()
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def throttle(self, delay):
+        """Slow down after a 429: pause for ``delay`` seconds, then space calls further apart."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, self.clock() + delay)
+            self.interval = min(MAX_INTERVAL, max(self.interval * 2, 1.0 / SECOND_LIMIT))
+
+    def relax(self):
+        """Called after a successful request to gradually remove the 429 slowdown."""
+        if not self.interval:
+            return
+        with self.lock:
+            self.interval *= 0.9
+            if self.interval < 0.05:
+                self.interval = 0.0
+
+    def usage(self):
+        """Calls made in the current day, hour and minute windows."""
+        if self.ledger is not None:
+            return self.ledger.usage(self.name)
+        with self.lock:
+            now = self.clock()
+            counts = {window: sum(1 for ts in calls if ts > now - window) for window, _, calls in self.windows}
+        return {
+            "api_calls": counts.get(86400, 0),
+            "hour_calls": counts.get(3600, 0),
+            "minute_calls": counts.get(60, 0),
+        }
+
+    def reset(self):
+        with self.lock:
+            for _, _, calls in self.windows:
+                calls.clear()
+
+
+def get_limiter(tenant):
+    """Return the shared limiter for ``tenant``, creating it on first use."""
+    with LOCK:
+        limiter = limiters.get(tenant)
+        if limiter is None:
+            limiter = RateLimiter(tenant, ledger=get_ledger())
+            limiters[tenant] = limiter
+        return limiter
@@ -0,0 +1,67 @@
+import email.utils
+import math
+import random
+import time
+
+import requests
+
+# Configuration
+CONNECT_TIMEOUT = 10   # Seconds to open the TCP/TLS connection
+READ_TIMEOUT = 120     # Seconds to wait for a page once connected
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0     # First retry waits about this long, doubling each attempt
+BACKOFF_MAX = 120.0
+
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Errors after which the same request is worth trying again
+RETRY_EXCEPTIONS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.ContentDecodingError,
+)
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for retry number ``attempt`` (0-based)."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def retry_after_seconds(response, now=None):
+    """Seconds the server asked us to wait, from ``Retry-After`` or rate-limit headers.
+
+    Capped at ``BACKOFF_MAX``. Returns None when the response carries no
+    usable hint, so the caller falls back to :func:`backoff_delay`.
+    """
+    delay = server_delay(response, time.time() if now is None else now)
+    if delay is None or math.isnan(delay):
+        return None
+    return min(BACKOFF_MAX, max(0.0, delay))
+
+
+def server_delay(response, now):
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+        try:
+            retry_date = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            retry_date = None  # Not a number nor an HTTP date: ignore it
+        if retry_date is not None:
+            return retry_date.timestamp() - now
+
+    remaining = response.headers.get('X-RateLimit-Remaining')
+    reset = response.headers.get('X-RateLimit-Reset')
+    if reset and (remaining is None or remaining.strip() == '0'):
+        try:
+            reset = float(reset)
+        except ValueError:
+            return None
+        # Some APIs send an epoch timestamp, others a number of seconds
+        return reset - now if reset > 1e9 else reset
+
+    return None
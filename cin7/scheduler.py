@@ -0,0 +1,77 @@
+import heapq
+import itertools
+import threading
+
+from cin7.rate_limiter import get_limiter
+
+# Priority lanes; a lower lane is always served first
+LANE_DAILY = 0
+LANE_BACKFILL = 1
+LANES = {'daily': LANE_DAILY, 'backfill': LANE_BACKFILL}
+
+LOCK = threading.Lock()  # Guards the registry only
+
+# One scheduler per tenant, in front of that tenant's rate limiter
+schedulers = {}
+
+
+class FairScheduler:
+    """Hand out one tenant's rate-limit tokens fairly between request flows.
+
+    A flow is one stream of page requests, e.g. one endpoint. Every
+    request joins a queue ordered by lane first, so daily jobs always go
+    ahead of backfills. Within a lane the order is start-time fair queuing:
+    each request is tagged with its flow's virtual finish time, and a flow
+    with weight 2 gets twice the tokens of a flow with weight 1 while both
+    have requests waiting. A flow that was idle does not bank credit.
+
+    Only the request at the head of the queue waits on the limiter, so the
+    tenant's budget is used as soon as a token frees up and is never
+    exceeded. Every other thread sleeps on the condition until its turn.
+    """
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.condition = threading.Condition()
+        self.queue = []       # Heap of (lane, finish tag, sequence, start tag)
+        self.finish = {}      # (lane, flow) -> finish tag of its last request
+        self.virtual_time = 0.0
+        self.sequence = itertools.count()
+        self.busy = False     # A request is at the limiter
+        self.granted = {}     # (lane, flow) -> tokens granted
+
+    def acquire(self, flow='default', lane=LANE_DAILY, weight=1.0):
+        """Block until it is this request's turn and the limiter grants a token.
+
+        Returns the seconds spent waiting on the limiter.
+        """
+        with self.condition:
+            key = (lane, flow)
+            start = max(self.virtual_time, self.finish.get(key, 0.0))
+            finish = start + 1.0 / weight
+            self.finish[key] = finish
+            ticket = (lane, finish, next(self.sequence), start)
+            heapq.heappush(self.queue, ticket)
+            while self.busy or self.queue[0] is not ticket:
+                self.condition.wait()
+            heapq.heappop(self.queue)
+            self.busy = True
+            self.virtual_time = max(self.virtual_time, start)
+
+        try:
+            return self.limiter.acquire()
+        finally:
+            with self.condition:
+                self.busy = False
+                self.granted[key] = self.granted.get(key, 0) + 1
+                self.condition.notify_all()
+
+
+def get_scheduler(tenant):
+    """Return the shared scheduler for ``tenant``, creating it on first use."""
+    with LOCK:
+        scheduler = schedulers.get(tenant)
+        if scheduler is None:
+            scheduler = FairScheduler(get_limiter(tenant))
+            schedulers[tenant] = scheduler
+        return scheduler
@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from cin7 import dropbox
+from cin7.client import format_api_date
+from cin7.dates import parse_date
+
+# Configuration
+STORE_FILE = os.path.join("state", "cin7_store.sqlite")
+ROWS_PER_PAGE = 250
+
+# One table per endpoint, keyed by tenant + Cin7 id
+TABLES = {
+    'SalesOrders': 'sales_orders',
+    'CreditNotes': 'credit_notes',
+    'PurchaseOrders': 'purchase_orders',
+}
+
+# Header columns copied out of the raw JSON so they can be filtered on without decoding it
+HEADER_COLUMNS = ['reference', 'company', 'branchId', 'currencyCode', 'isVoid']
+DATE_COLUMNS = ['invoiceDate', 'completedDate', 'createdDate', 'fullyReceivedDate', 'modifiedDate']
+
+
+def normalise_date(date_string):
+    """Store dates as sortable UTC ISO strings so range filters are plain string comparisons."""
+    parsed_date = parse_date(date_string)
+    return format_api_date(parsed_date) if parsed_date else None
+
+
+class OrderStore:
+    """Local SQLite mirror of raw Cin7 SalesOrders, CreditNotes and PurchaseOrders."""
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()  # Tenant threads share one connection
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.create_tables()
+
+    def create_tables(self):
+        columns = ', '.join(f'"{column}"' for column in HEADER_COLUMNS + DATE_COLUMNS)
+        with self.lock, self.conn:
+            for table in TABLES.values():
+                self.conn.execute(
+                    f'CREATE TABLE IF NOT EXISTS {table} ('
+                    f'tenant TEXT NOT NULL, id INTEGER NOT NULL, {columns}, raw TEXT NOT NULL, '
+                    f'PRIMARY KEY (tenant, id))'
+                )
+                for date_column in DATE_COLUMNS:
+                    self.conn.execute(
+                        f'CREATE INDEX IF NOT EXISTS {table}_{date_column} ON {table} (tenant, "{date_column}")'
+                    )
+
+    def upsert(self, endpoint, tenant, records):
+        """Insert or replace ``records`` (one API page) for ``tenant``."""
+        table = TABLES[endpoint]
+        columns = HEADER_COLUMNS + DATE_COLUMNS
+        placeholders = ', '.join('?' for _ in range(len(columns) + 3))
+        updates = ', '.join(f'"{column}"=excluded."{column}"' for column in columns + ['raw'])
+        rows = []
+        for record in records:
+            if record.get('id') is None:
+                continue
+            header = [record.get(column) for column in HEADER_COLUMNS]
+            dates = [normalise_date(record.get(column)) for column in DATE_COLUMNS]
+            # Typed records (--decoder msgspec) are stored as the fields they decoded
+            raw = json.dumps(record, default=lambda typed: typed.to_dict())
+            rows.append([tenant, record['id']] + header + dates + [raw])
+
+        quoted_columns = ', '.join(f'"{column}"' for column in columns)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f'INSERT INTO {table} (tenant, id, {quoted_columns}, raw) VALUES ({placeholders}) '
+                f'ON CONFLICT (tenant, id) DO UPDATE SET {updates}',
+                rows,
+            )
+        return len(rows)
+
+    def iter_pages(self, endpoint, tenant, date_field, start_date, end_date, rows=ROWS_PER_PAGE):
+        """Yield stored records for ``tenant`` in the date window, in API-sized pages.
+
+        Only one page of raw JSON is read at a time, and the lock is released
+        between pages so other tenants can keep writing meanwhile.
+        """
+        table = TABLES[endpoint]
+        with self.lock:
+            cursor = self.conn.execute(
+                f'SELECT raw FROM {table} WHERE tenant = ? AND "{date_field}" BETWEEN ? AND ? ORDER BY id',
+                (tenant, format_api_date(start_date), format_api_date(end_date)),
+            )
+        try:
+            while True:
+                with self.lock:
+                    raw_records = cursor.fetchmany(rows)
+                if not raw_records:
+                    return
+                yield [json.loads(raw) for (raw,) in raw_records]
+        finally:
+            cursor.close()
+
+    def count(self, endpoint, tenant=None):
+        table = TABLES[endpoint]
+        with self.lock:
+            if tenant is None:
+                return self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            return self.conn.execute(f'SELECT COUNT(*) FROM {table} WHERE tenant = ?', (tenant,)).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_store(path, dropbox_path=None):
+    """Open the store at ``path``, first refreshing it from Dropbox if ``dropbox_path`` is set."""
+    if dropbox_path:
+        if dropbox.download_file(dropbox_path, path):
+            logging.info(f"Downloaded order store from Dropbox: {dropbox_path}")
+        else:
+            logging.info(f"No order store in Dropbox at {dropbox_path}; starting an empty one.")
+    return OrderStore(path)
+
+
+def save_store(store, dropbox_path=None):
+    """Close the store and, if ``dropbox_path`` is set, upload it for the next run."""
+    with store.lock:
+        store.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    store.close()
+    if dropbox_path:
+        dropbox.upload_file(store.path, dropbox_path)
+        logging.info(f"Uploaded order store to Dropbox: {dropbox_path}")
@@ -0,0 +1,76 @@
+import datetime
+import json
+import logging
+import os
+import threading
+
+from cin7 import dropbox
+from cin7.client import format_api_date
+
+# Configuration
+STATE_FILE = os.path.join("state", "sync_state.json")
+INCREMENTAL_FIELD = 'modifiedDate'
+
+
+class SyncState:
+    """Per-tenant, per-endpoint ``modifiedDate`` high-water marks.
+
+    Stored as a small JSON file of the form
+    ``{"AlbertRogerUK": {"SalesOrders": "2025-01-31T10:00:00Z"}}``.
+    """
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.lock = threading.Lock()  # Tenant threads update marks concurrently
+        self.watermarks = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self.watermarks = json.load(f)
+            logging.info(f"Loaded sync state from {self.path}")
+        return self
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self.lock:
+            with open(tmp_path, mode='w', encoding='utf-8') as f:
+                json.dump(self.watermarks, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)  # Never leave a half-written state file behind
+        logging.info(f"Sync state saved to {self.path}")
+
+    def get_watermark(self, tenant, endpoint):
+        with self.lock:
+            value = self.watermarks.get(tenant, {}).get(endpoint)
+        if not value:
+            return None
+        return datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=datetime.timezone.utc)
+
+    def set_watermark(self, tenant, endpoint, modified_date):
+        with self.lock:
+            self.watermarks.setdefault(tenant, {})[endpoint] = format_api_date(modified_date)
+
+    def pull(self, dropbox_path):
+        """Replace the local state file with the copy stored in Dropbox, if any."""
+        if dropbox.download_file(dropbox_path, self.path):
+            logging.info(f"Downloaded sync state from Dropbox: {dropbox_path}")
+        else:
+            logging.info(f"No sync state in Dropbox at {dropbox_path}; starting from scratch.")
+        return self.load()
+
+    def push(self, dropbox_path):
+        self.save()
+        dropbox.upload_file(self.path, dropbox_path)
+        logging.info(f"Uploaded sync state to Dropbox: {dropbox_path}")
+
+
+def incremental_where(where, watermark):
+    """Narrow ``where`` to records modified at or after ``watermark``.
+
+    ``>=`` rather than ``>`` so records sharing the watermark's second are
+    fetched again instead of being skipped.
+    """
+    if watermark is None:
+        return where
+    return f"{where} AND {INCREMENTAL_FIELD}>='{format_api_date(watermark)}'"
@@ -0,0 +1,31 @@
+from openpyxl import Workbook
+
+from cin7.pipeline import RowWriter, QUEUE_DEPTH
+
+# Configuration
+SHEET_NAME = 'Sheet1'  # Same sheet name DataFrame.to_excel used
+
+
+class XlsxRowWriter(RowWriter):
+    """:class:`RowWriter` that streams rows into a write-only openpyxl workbook.
+
+    Write-only worksheets spool rows to a temporary file instead of keeping
+    a cell object per value, so memory stays flat however many rows are
+    written. The workbook is assembled when the ``with`` block exits.
+    """
+
+    def __init__(self, path, fieldnames, depth=QUEUE_DEPTH):
+        super().__init__(path, fieldnames, depth)
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(SHEET_NAME)
+
+    def open(self):
+        self.sheet.append(self.fieldnames)
+
+    def write_rows(self, rows):
+        append = self.sheet.append
+        for row in rows:
+            append(row)
+
+    def close(self):
+        self.workbook.save(self.path)